@@ -0,0 +1,69 @@
+import importlib
+import os
+from typing import Protocol
+
+# STORAGE_BACKEND value -> module implementing StorageBackend.
+BACKENDS = {
+    "sheets": "app.storage_sheets",
+    "json": "app.storage",
+    "sqlite": "app.storage_sqlite",
+    "daemon": "app.storage_daemon",
+}
+DEFAULT_BACKEND = "sheets"
+
+
+class StorageBackend(Protocol):
+    """
+    What run.py needs from a storage module.
+    Each backend is a module with these functions.
+    """
+
+    # Ids reserved per reserve_ids call for single new transactions.
+    ID_BLOCK_SIZE: int
+
+    def load_data(self) -> dict:
+        # Returns indexed data (see app.ledger.build_index).
+        ...
+
+    def load_years(self, years) -> list:
+        # Returns the transactions of years that load_data listed in
+        # data["unloaded_years"]; only sheets leaves any out.
+        ...
+
+    def append_transaction(self, transaction) -> None:
+        ...
+
+    def append_transactions(self, transactions) -> None:
+        # Saves many new transactions at once, e.g. from an import.
+        ...
+
+    def upsert_budget(self, month: str, category: str,
+                      limit: float) -> bool:
+        ...
+
+    def reserve_ids(self, count: int, floor: int) -> range:
+        # Reserves at least count new ids above floor, unique across
+        # sessions; returns them as a range.
+        ...
+
+    def flush_transactions(self) -> tuple:
+        # Writes anything still pending; returns (rows, seconds).
+        ...
+
+
+def get_backend(name=None) -> StorageBackend:
+    """
+    Returns the storage module named by name or the STORAGE_BACKEND
+    environment variable (sheets, json, sqlite or daemon;
+    default sheets).
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    name = (name or os.environ.get("STORAGE_BACKEND") or DEFAULT_BACKEND)
+    name = name.strip().lower()
+    if name not in BACKENDS:
+        choices = ", ".join(BACKENDS)
+        raise ValueError(
+            f"Unknown STORAGE_BACKEND {name!r}. Use one of: {choices}.")
+    return importlib.import_module(BACKENDS[name])
@@ -0,0 +1,437 @@
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import gspread
+from tabulate import tabulate
+
+import run
+from app import ratelimit
+from app import search
+from app import sheets
+from app import storage_sheets
+
+# Most time allowed from launching run.py to its first prompt.
+STARTUP_BUDGET_SECONDS = 0.5
+RUN_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.py")
+
+CATEGORIES = [
+    "Food", "Rent", "Transport", "Utilities", "Health", "Fun",
+    "Clothes", "Gifts", "Travel", "Education", "Salary", "Bonus",
+]
+
+
+def generate_ledger(size, seed=1, years=5, start_year=2022):
+    """
+    Returns a reproducible list of transaction rows
+    [id, date, type, category, amount, note] as the sheet stores them.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for t_id in range(1, size + 1):
+        year = start_year + rng.randrange(years)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        t_type = "income" if rng.random() < 0.2 else "expense"
+        rows.append([
+            str(t_id),
+            f"{year}-{month:02d}-{day:02d}",
+            t_type,
+            rng.choice(CATEGORIES),
+            f"{rng.randint(100, 200000) / 100:.2f}",
+            rng.choice(["", "", "weekly shop", "card", "cash"]),
+        ])
+    return rows
+
+
+def generate_budgets(seed=1, years=5, start_year=2022):
+    # Returns budget rows [month, category, limit] for every month.
+    rng = random.Random(seed)
+    rows = []
+    for year in range(start_year, start_year + years):
+        for month in range(1, 13):
+            for category in CATEGORIES[:6]:
+                rows.append([
+                    f"{year}-{month:02d}",
+                    category,
+                    str(rng.randint(50, 2000)),
+                ])
+    return rows
+
+
+class FakeWorksheet:
+    """
+    In-memory stand-in for a gspread Worksheet.
+    Each API method counts one request and can sleep to
+    simulate network latency.
+    """
+
+    def __init__(self, spreadsheet, title, rows):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = rows
+
+    def _request(self, name):
+        self.spreadsheet.request(f"{self.title}.{name}")
+
+    def get_all_values(self, **kwargs):
+        self._request("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self, **kwargs):
+        self._request("get_all_records")
+        header = self.rows[0] if self.rows else []
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+    def get(self, range_name, **kwargs):
+        self._request("get")
+        return self.spreadsheet.read_range(self, range_name)
+
+    def row_values(self, row, **kwargs):
+        self._request("row_values")
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def append_row(self, values, **kwargs):
+        self._request("append_row")
+        return self._append([values])
+
+    def append_rows(self, values, **kwargs):
+        self._request("append_rows")
+        return self._append(values)
+
+    def _append(self, values):
+        first = len(self.rows) + 1
+        self.rows.extend([str(v) for v in row] for row in values)
+        last = len(self.rows)
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:F{last}"}}
+
+    def update(self, values, range_name=None, **kwargs):
+        # Supports "A<row>:..." ranges, e.g. "A1:B1".
+        self._request("update")
+        row = int(range_name.split(":")[0][1:])
+        while len(self.rows) < row + len(values) - 1:
+            self.rows.append([])
+        for offset, new_row in enumerate(values):
+            self.rows[row - 1 + offset] = [str(v) for v in new_row]
+
+    def clear(self):
+        self._request("clear")
+        self.rows.clear()
+
+    def update_title(self, title):
+        self._request("update_title")
+        sheets = self.spreadsheet.sheets
+        sheets[title] = sheets.pop(self.title)
+        self.title = title
+
+    def update_cell(self, row, col, value):
+        self._request("update_cell")
+        self.rows[row - 1][col - 1] = str(value)
+
+    def batch_update(self, data, **kwargs):
+        self._request("batch_update")
+        for update in data:
+            cell = update["range"]
+            column = ord(cell[0]) - ord("A")
+            self.rows[int(cell[1:]) - 1][column] = str(update["values"][0][0])
+
+
+class FakeSpreadsheet:
+    """
+    In-memory stand-in for a gspread Spreadsheet holding
+    FakeWorksheets, with a shared request counter.
+    """
+
+    id = "benchmark"
+
+    def __init__(self, worksheets, latency=0.0):
+        self.latency = latency
+        self.requests = {}
+        self.sheets = {
+            title: FakeWorksheet(self, title, rows)
+            for title, rows in worksheets.items()
+        }
+
+    def request(self, name):
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def worksheets(self):
+        self.request("worksheets")
+        return list(self.sheets.values())
+
+    def worksheet(self, title):
+        self.request("worksheet")
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows=1, cols=1, **kwargs):
+        self.request("add_worksheet")
+        self.sheets[title] = FakeWorksheet(self, title, [])
+        return self.sheets[title]
+
+    def read_range(self, ws, range_name):
+        # Supports whole sheets, "A<start>:F" and "A<start>:B<end>".
+        if not range_name:
+            return [list(row) for row in ws.rows]
+        start, _, end = range_name.partition(":")
+        start = int(start[1:])
+        end = "".join(ch for ch in end if ch.isdigit())
+        stop = int(end) if end else len(ws.rows)
+        return [list(row) for row in ws.rows[start - 1:stop]]
+
+    def values_batch_get(self, ranges, **kwargs):
+        self.request("values_batch_get")
+        value_ranges = []
+        for range_name in ranges:
+            title, _, cells = range_name.partition("!")
+            values = self.read_range(self.sheets[title], cells)
+            value_ranges.append({"range": range_name, "values": values})
+        return {"valueRanges": value_ranges}
+
+
+def install_fake(spreadsheet):
+    """
+    Points the app's Sheets session at a fake spreadsheet and
+    clears module state left by an earlier run.
+    """
+    run.storage = storage_sheets
+    sheets.reset_session()
+    sheets._session["client"] = object()
+    sheets._session["spreadsheet"] = spreadsheet
+    storage_sheets._transaction_queue = None
+    storage_sheets._budget_index["rows"] = None
+    storage_sheets._sequence["base"] = None
+    storage_sheets._manifest["years"] = None
+
+
+@contextlib.contextmanager
+def scripted_input(answers):
+    # Feeds prompts from a list and hides everything printed.
+    answers = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(answers, "")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original_input
+
+
+def measure(name, size, spreadsheet, action):
+    """
+    Runs action() once and returns a result row with
+    wall time, API requests made and peak traced memory.
+    """
+    requests_before = spreadsheet.request_count()
+    tracemalloc.start()
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return [
+        name,
+        size,
+        f"{elapsed * 1000:.1f}",
+        spreadsheet.request_count() - requests_before,
+        f"{peak / 1024 / 1024:.2f}",
+    ]
+
+
+def run_size(size, latency, seed):
+    # Benchmarks every operation for one ledger size.
+    header = ["id", "date", "type", "category", "amount", "note"]
+    spreadsheet = FakeSpreadsheet({
+        "transactions": [header] + generate_ledger(size, seed),
+        "budgets": [["month", "category", "limit"]] + generate_budgets(seed),
+    }, latency=latency)
+    install_fake(spreadsheet)
+
+    results = []
+    state = {}
+
+    def load():
+        state["data"] = storage_sheets.load_data()
+
+    # The fixture has the single transactions worksheet of older
+    # versions, which the first load splits into one per year.
+    results.append(measure(
+        "split into years", size, spreadsheet,
+        storage_sheets.prepare_manifest))
+    install_fake(spreadsheet)
+    results.append(measure("load_data (cold)", size, spreadsheet, load))
+    install_fake(spreadsheet)
+    results.append(measure("load_data (cached)", size, spreadsheet, load))
+    data = state["data"]
+
+    def add():
+        answers = ["2024-06-15", "expense", "food", "", "12.50", "y"]
+        with scripted_input(answers):
+            run.add_transaction(data)
+        storage_sheets.flush_transactions()
+
+    def view():
+        with scripted_input(["0"]):
+            run.view_transactions(data)
+
+    def report():
+        with scripted_input(["2024-06"]):
+            run.monthly_report(data)
+
+    def budget_status():
+        with scripted_input(["2024-06"]):
+            run.view_budget_status(data)
+
+    def export():
+        with scripted_input([]):
+            run.export_transactions_csv(data)
+
+    def build_search_index():
+        search.get_index(data)
+
+    def find():
+        # A rent payment with "card" in the note, from 10.00 to 500.00.
+        search.get_index(data).find(["rent", "card"], 1000, 50000)
+
+    def upsert():
+        storage_sheets.upsert_budget("2024-06", "Food", 321.0)
+        storage_sheets.upsert_budget("2031-01", "Food", 100.0)
+
+    for name, action in [
+        # The first add also reserves a block of ids.
+        ("add_transaction (first)", add),
+        ("add_transaction", add),
+        # 2024 is not loaded at startup, so the report reads it.
+        ("monthly_report (older year)", report),
+        # The same report again comes from the report cache.
+        ("monthly_report (repeat)", report),
+        ("view_budget_status", budget_status),
+        ("view_transactions (page)", view),
+        ("export_transactions_csv", export),
+        ("search (build index)", build_search_index),
+        ("search (words + amount)", find),
+        ("upsert_budget x2", upsert),
+    ]:
+        results.append(measure(name, size, spreadsheet, action))
+
+    return results
+
+
+def import_time(module):
+    """
+    Returns the seconds spent importing module in a fresh interpreter,
+    as reported by python -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(RUN_PATH), capture_output=True, text=True,
+        check=True)
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000000
+    return 0.0
+
+
+def time_to_first_prompt(cwd, env):
+    # Starts run.py and returns the seconds until the intro prompt.
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", RUN_PATH], cwd=cwd, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL)
+    output = b""
+    try:
+        while b"Press Enter" not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("run.py exited before its first prompt.")
+            output += chunk
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def check_startup(runs=5):
+    """
+    Prints the import time of run.py and its best time to first
+    prompt out of runs. Returns False if that is over
+    STARTUP_BUDGET_SECONDS.
+    """
+    # The intro appears before any data is loaded, so the JSON
+    # backend in a scratch directory is enough here.
+    env = dict(os.environ, STORAGE_BACKEND="json")
+    with tempfile.TemporaryDirectory() as scratch:
+        best = min(
+            time_to_first_prompt(scratch, env) for _ in range(runs))
+
+    rows = [
+        ["import run", f"{import_time('run') * 1000:.1f}"],
+        ["first prompt", f"{best * 1000:.1f}"],
+    ]
+    print(tabulate(rows, headers=["Step", "Time (ms)"], tablefmt="grid"))
+
+    if best > STARTUP_BUDGET_SECONDS:
+        print(f"Over the startup budget of {STARTUP_BUDGET_SECONDS}s.")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the budget planner on synthetic ledgers.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+        help="ledger sizes to test (default: 1000 10000 100000)")
+    parser.add_argument(
+        "--latency", type=float, default=0.0,
+        help="simulated seconds per Sheets API request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--startup", action="store_true",
+        help="time the start of run.py instead; exits with status 1 "
+             f"if the first prompt takes over {STARTUP_BUDGET_SECONDS}s")
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(0 if check_startup() else 1)
+
+    # The fake has no quota, so the client-side limits are lifted.
+    for kind in ratelimit.QUOTAS:
+        ratelimit.configure(kind, per_minute=10 ** 9, burst=10 ** 6)
+
+    results = []
+    project_dir = os.getcwd()
+    # Cache, spool and export files go to a scratch directory.
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for size in args.sizes:
+                results.extend(run_size(size, args.latency, args.seed))
+                for name in os.listdir("data"):
+                    os.remove(os.path.join("data", name))
+        finally:
+            os.chdir(project_dir)
+
+    headers = ["Operation", "Rows", "Time (ms)", "API calls", "Peak MB"]
+    print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    main()
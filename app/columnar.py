@@ -0,0 +1,85 @@
+# Optional NumPy engine for reports over large ledgers.
+# app/ledger.py uses it when NumPy is installed and falls back to
+# plain Python otherwise; both paths give the same results.
+# NumPy is imported on first use, so starting the app does not wait
+# for it.
+np = None
+_checked = False
+
+
+def available():
+    global np, _checked
+    if not _checked:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+        _checked = True
+    return np is not None
+
+
+def build_columns(transactions):
+    """
+    Copies transactions into column arrays.
+    Categories are stored as codes into the "categories" list.
+    """
+    count = len(transactions)
+    categories = {}
+    codes = [
+        categories.setdefault(t.category, len(categories))
+        for t in transactions
+    ]
+
+    return {
+        "count": count,
+        "day": np.fromiter(
+            (t.day for t in transactions), dtype=np.int64, count=count),
+        "month": np.fromiter(
+            (t.month for t in transactions), dtype=np.int64, count=count),
+        "expense": np.fromiter(
+            (t.type == "expense" for t in transactions),
+            dtype=np.int64, count=count),
+        "category": np.array(codes, dtype=np.int64),
+        "cents": np.fromiter(
+            (t.amount_cents for t in transactions),
+            dtype=np.int64, count=count),
+        "categories": list(categories),
+    }
+
+
+def grouped_totals(columns):
+    """
+    Sums cents by (month, type, category) in one pass.
+    Returns the same shape as data["totals"]:
+    {month: {(type, category): total cents}}.
+    """
+    if columns["count"] == 0:
+        return {}
+
+    category_count = len(columns["categories"])
+    keys = (
+        (columns["month"] * 2 + columns["expense"]) * category_count
+        + columns["category"]
+    )
+    unique_keys, group = np.unique(keys, return_inverse=True)
+    # Float sums are exact for totals below 2**53 cents.
+    sums = np.bincount(group, weights=columns["cents"])
+
+    totals = {}
+    for key, total in zip(unique_keys.tolist(), sums.tolist()):
+        rest, code = divmod(key, category_count)
+        month, expense = divmod(rest, 2)
+        t_type = "expense" if expense else "income"
+        month_totals = totals.setdefault(month, {})
+        month_totals[(t_type, columns["categories"][code])] = round(total)
+    return totals
+
+
+def date_order(columns):
+    """
+    Returns row positions ordered by date, oldest first.
+    Rows with the same date keep their ledger order, like sorted().
+    """
+    return np.argsort(columns["day"], kind="stable").tolist()
+
@@ -0,0 +1,244 @@
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from app import ids, ledger, locks
+from app.backend import get_backend
+from app.models import Transaction, to_cents
+
+SOCKET_PATH = os.environ.get(
+    "PLANNER_SOCKET", os.path.join("data", "planner.sock"))
+LOG_FILE_PATH = os.path.join("data", "planner.log")
+
+# Storage the service itself uses, from SERVICE_BACKEND.
+DEFAULT_SERVICE_BACKEND = "sheets"
+
+# How often the data is read again from storage, to pick up changes
+# made outside the service (e.g. edits in the spreadsheet).
+RELOAD_INTERVAL_SECONDS = 60
+
+
+def encode_transaction(t):
+    # Compact row sent to clients: already validated values.
+    return [t.id, t.day, t.month, t.type, t.category, t.amount_cents, t.note]
+
+
+def encode_data(data):
+    # The transactions and budgets as sent to clients.
+    return {
+        "transactions": [encode_transaction(t) for t in data["transactions"]],
+        "budgets": [b.to_dict() for b in data["budgets"]],
+    }
+
+
+class LedgerService:
+    """
+    Holds one warm, indexed copy of the data and the storage
+    connection, and answers requests from terminal sessions.
+    version changes whenever the data does; a client that already
+    has the data of its version is not sent it again.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.data = self.read_data()
+        self.lock = threading.Lock()
+        self.load_reply = None
+        # Unique per service run, so a restarted service never
+        # repeats a version of the one before.
+        self.run_id = uuid.uuid4().hex
+        self.changes = 0
+
+    @property
+    def version(self):
+        return f"{self.run_id}:{self.changes}"
+
+    def changed(self):
+        # Called after every change to the data.
+        self.changes += 1
+        self.load_reply = None
+
+    def read_data(self, previous=None):
+        """
+        Loads the data from storage. The service keeps every year in
+        memory, so its clients never have older years to load. On a
+        reload the older years are taken from previous instead of
+        being read again.
+        """
+        data = self.backend.load_data()
+        unloaded = data.get("unloaded_years")
+        if unloaded:
+            if previous is None:
+                history = self.backend.load_years(unloaded)
+            else:
+                years = set(unloaded)
+                history = [
+                    t for t in previous["transactions"]
+                    if ledger.transaction_year(t) in years]
+            ledger.add_history(data, unloaded, history)
+        return data
+
+    def reload(self):
+        """
+        Reads the data from storage again and swaps it in if it
+        differs from the data held. Returns True if it did.
+        The lock is held throughout, as the storage modules are not
+        safe to use from two threads at once.
+        """
+        with self.lock:
+            data = self.read_data(self.data)
+            if encode_data(data) == encode_data(self.data):
+                return False
+            # The id allocator keeps its reserved block.
+            if "ids" in self.data:
+                data["ids"] = self.data["ids"]
+            self.data = data
+            self.changed()
+            return True
+
+    def reload_forever(self, interval=RELOAD_INTERVAL_SECONDS):
+        # Reloads the data every interval seconds; run on a thread.
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception as error:
+                # The data held stays in use until the next try.
+                print(f"Reload failed: {type(error).__name__}: {error}")
+
+    def handle(self, request):
+        op = request.get("op")
+        with self.lock:
+            if op == "load":
+                return self.load(request.get("version"))
+            if op == "append_transaction":
+                return self.append_transaction(request["transaction"])
+            if op == "append_transactions":
+                return self.append_transactions(request["transactions"])
+            if op == "reserve_ids":
+                return self.reserve_ids(request["count"], request["floor"])
+            if op == "upsert_budget":
+                return self.upsert_budget(
+                    request["month"], request["category"], request["limit"])
+            if op == "flush":
+                written, seconds = self.backend.flush_transactions()
+                return {"written": written, "seconds": seconds}
+        return {"error": f"Unknown request: {op!r}"}
+
+    def load(self, version=None):
+        """
+        Returns the data, or only {"version", "unchanged"} if the
+        client already has this version. The encoded data is reused
+        until the next change.
+        """
+        if version == self.version:
+            return {"version": version, "unchanged": True}
+        if self.load_reply is None:
+            self.load_reply = {
+                "version": self.version,
+                **encode_data(self.data),
+                "totals": [
+                    [month, t_type, category, total]
+                    for month, month_totals in self.data["totals"].items()
+                    for (t_type, category), total in month_totals.items()
+                ],
+            }
+        return self.load_reply
+
+    def append_transaction(self, values):
+        transaction = Transaction.from_dict(values)
+        self.backend.append_transaction(transaction)
+        ledger.add_transaction(self.data, transaction)
+        self.changed()
+        return {}
+
+    def append_transactions(self, values):
+        transactions = [Transaction.from_dict(v) for v in values]
+        self.backend.append_transactions(transactions)
+        ledger.add_transactions(self.data, transactions)
+        self.changed()
+        return {}
+
+    def reserve_ids(self, count, floor):
+        # Ids come from the service's allocator, shared by all sessions.
+        allocator = ids.get_allocator(self.data, self.backend)
+        allocator.high_water = max(allocator.high_water, floor)
+        return {"start": allocator.allocate(count)}
+
+    def upsert_budget(self, month, category, limit):
+        updated = self.backend.upsert_budget(month, category, limit)
+        ledger.set_budget(self.data, month, category, to_cents(limit))
+        self.changed()
+        return {"updated": updated}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line, one JSON reply per line.
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.service.handle(json.loads(line))
+            except Exception as error:
+                reply = {"error": f"{type(error).__name__}: {error}"}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=SOCKET_PATH):
+    """
+    Loads the data once and serves it on a Unix socket until the
+    process is stopped. Pending writes are flushed on the way out.
+    Only one service runs per socket: it locks path + ".lock" before
+    loading and keeps the lock until it exits.
+    """
+    load_dotenv()
+    lock_file = locks.try_lock(path + ".lock")
+    if lock_file is None:
+        print(f"The data service is already running on {path}.")
+        return
+
+    backend_name = os.environ.get("SERVICE_BACKEND", DEFAULT_SERVICE_BACKEND)
+    if backend_name == "daemon":
+        raise ValueError("SERVICE_BACKEND cannot be 'daemon'.")
+    backend = get_backend(backend_name)
+    service = LedgerService(backend)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = Server(path, RequestHandler)
+    server.service = service
+    threading.Thread(target=service.reload_forever, daemon=True).start()
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+        with service.lock:
+            backend.flush_transactions()
+        lock_file.close()
+
+
+if __name__ == "__main__":
+    serve()
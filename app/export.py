@@ -0,0 +1,210 @@
+import csv
+import gzip
+import json
+import os
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from app.models import month_key
+
+EXPORT_DIR = "exports"
+STATE_FILE_PATH = os.path.join("data", "export_state.json")
+
+# Rows converted and written per chunk, which bounds the memory an
+# export needs whatever the ledger size.
+CHUNK_ROWS = 5000
+
+# Output format -> file extension.
+FORMATS = {
+    "csv": "csv",
+    "csv.gz": "csv.gz",
+    "parquet": "parquet",
+}
+
+COLUMNS = ["id", "date", "type", "category", "amount", "note"]
+
+
+def default_path(fmt):
+    return os.path.join(EXPORT_DIR, f"transactions.{FORMATS[fmt]}")
+
+
+def select_transactions(data, start=None, end=None, categories=None,
+                        after_id=0):
+    """
+    Yields the transactions to export, lazily.
+    start and end are YYYY-MM-DD strings (inclusive) and use the
+    month index, so only the months in range are read; those rows
+    come out by date. Without a date range the ledger order is kept.
+    categories is a list of category names (any case).
+    Only ids above after_id are yielded.
+    """
+    if categories:
+        categories = {c.strip().lower() for c in categories}
+
+    if start or end:
+        first_day = date.fromisoformat(start).toordinal() if start else 0
+        last_day = (
+            date.fromisoformat(end).toordinal() if end else float("inf"))
+        first_month = month_key(start[:7]) if start else 0
+        last_month = month_key(end[:7]) if end else float("inf")
+        months = sorted(
+            m for m in data["by_month"] if first_month <= m <= last_month)
+        transactions = (
+            t for m in months for t in data["by_month"][m]
+            if first_day <= t.day <= last_day)
+    else:
+        transactions = iter(data["transactions"])
+
+    for t in transactions:
+        if t.id <= after_id:
+            continue
+        if categories and t.category.lower() not in categories:
+            continue
+        yield t
+
+
+def chunked(transactions, size=CHUNK_ROWS):
+    # Yields lists of up to size transactions.
+    transactions = iter(transactions)
+    while True:
+        chunk = list(islice(transactions, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(path, chunks, compress=False, append=False):
+    """
+    Writes chunks of transactions as CSV rows, gzip-compressed if
+    compress is set. With append, rows are added to the end of an
+    existing file (a gzip file gets a new member, which readers join).
+    The header is written only when the file is new.
+    Returns the number of rows and the highest id written.
+    """
+    new_file = not (append and os.path.exists(path))
+    mode = "wt" if new_file else "at"
+    opener = gzip.open if compress else open
+
+    count = 0
+    last_id = 0
+    with opener(path, mode, newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(COLUMNS)
+        for chunk in chunks:
+            writer.writerows(
+                [t.id, t.date, t.type, t.category, t.amount, t.note]
+                for t in chunk
+            )
+            count += len(chunk)
+            last_id = max(last_id, max(t.id for t in chunk))
+    return count, last_id
+
+
+def write_parquet(path, chunks):
+    """
+    Writes chunks of transactions to a Parquet file, one row group
+    per chunk. Needs the optional pyarrow package.
+    Returns the number of rows and the highest id written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError(
+            "Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("type", pa.dictionary(pa.int8(), pa.string())),
+        ("category", pa.dictionary(pa.int32(), pa.string())),
+        ("amount", pa.decimal128(18, 2)),
+        ("note", pa.string()),
+    ])
+
+    count = 0
+    last_id = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(pa.record_batch([
+                pa.array([t.id for t in chunk], pa.int64()),
+                pa.array(
+                    [date.fromordinal(t.day) for t in chunk], pa.date32()),
+                pa.array([t.type for t in chunk]).dictionary_encode(),
+                pa.array([t.category for t in chunk]).dictionary_encode(),
+                pa.array(
+                    [Decimal(t.amount_cents).scaleb(-2) for t in chunk],
+                    pa.decimal128(18, 2)),
+                pa.array([t.note for t in chunk], pa.string()),
+            ], schema=schema))
+            count += len(chunk)
+            last_id = max(last_id, max(t.id for t in chunk))
+    return count, last_id
+
+
+def read_state():
+    # Returns {export path: last exported id}.
+    if not os.path.exists(STATE_FILE_PATH):
+        return {}
+    with open(STATE_FILE_PATH, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_state(state):
+    directory = os.path.dirname(STATE_FILE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = STATE_FILE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2)
+    os.replace(tmp_path, STATE_FILE_PATH)
+
+
+def export_transactions(data, fmt="csv", path=None, start=None, end=None,
+                        categories=None, incremental=False):
+    """
+    Streams the selected transactions to a file in chunks.
+    fmt is "csv", "csv.gz" or "parquet"; path defaults to
+    exports/transactions.<fmt>. The last id exported to each path is
+    remembered in data/export_state.json. With incremental, only
+    transactions with ids above it are appended; a file with no
+    remembered id is written in full instead.
+    Returns (path, number of rows written).
+    Raises ValueError for an unknown format or an incremental
+    Parquet export, which cannot be appended to.
+    """
+    if fmt not in FORMATS:
+        choices = ", ".join(FORMATS)
+        raise ValueError(f"Unknown format {fmt!r}. Use one of: {choices}.")
+    if incremental and fmt == "parquet":
+        raise ValueError(
+            "Parquet files cannot be appended to. Use csv or csv.gz "
+            "for incremental export.")
+
+    path = path or default_path(fmt)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    state = read_state()
+    # Rows are only appended to a file whose last exported id is
+    # known; otherwise (a new, deleted or untracked file) the file is
+    # written again with every row.
+    append = incremental and path in state and os.path.exists(path)
+    after_id = state[path] if append else 0
+
+    chunks = chunked(select_transactions(
+        data, start, end, categories, after_id))
+    if fmt == "parquet":
+        count, last_id = write_parquet(path, chunks)
+    else:
+        count, last_id = write_csv(
+            path, chunks, compress=fmt == "csv.gz", append=append)
+
+    # Recorded for full exports too, so a later incremental export to
+    # the same file starts after them.
+    state[path] = max(after_id, last_id)
+    write_state(state)
+    return path, count
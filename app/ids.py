@@ -0,0 +1,80 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; the counter file is then unlocked.
+    fcntl = None
+
+
+class IdAllocator:
+    """
+    Hands out transaction ids without looking at the ledger.
+    Ids come from blocks reserved through the storage backend's
+    reserve_ids(count, floor), which keeps them unique across
+    sessions. The high-water mark is the highest id known to be in
+    use; ids at or below it are never handed out, so ids written by
+    an older version of the app are skipped.
+    """
+
+    def __init__(self, storage, high_water=0):
+        self.reserve = storage.reserve_ids
+        self.block_size = storage.ID_BLOCK_SIZE
+        self.high_water = high_water
+        self.next = 0
+        self.end = 0
+        self.lock = threading.Lock()
+
+    def allocate(self, count=1):
+        """
+        Returns the first of count new consecutive ids.
+        A backend call is only made when the current block runs out.
+        """
+        with self.lock:
+            self.next = max(self.next, self.high_water + 1)
+            while self.end - self.next < count:
+                ids = self.reserve(
+                    max(count, self.block_size), self.high_water)
+                if ids.start != self.end:
+                    # Not next to the current block: start the new one.
+                    self.next = max(ids.start, self.high_water + 1)
+                self.end = ids.stop
+
+            first = self.next
+            self.next += count
+            self.high_water = first + count - 1
+            return first
+
+
+def get_allocator(data, storage):
+    # Returns the session's id allocator, creating it on first use.
+    if data.get("ids") is None:
+        high_water = max((t.id for t in data["transactions"]), default=0)
+        data["ids"] = IdAllocator(storage, high_water)
+    return data["ids"]
+
+
+def reserve_from_file(path, count, floor):
+    """
+    Reserves count ids above floor from a counter file holding the
+    next free id. The file is locked while it is read and rewritten,
+    so sessions running at the same time get different ids.
+    Returns the range of reserved ids.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, "a+", encoding="utf-8") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        file.seek(0)
+        text = file.read().strip()
+        start = max(int(text or 0), floor + 1)
+        file.seek(0)
+        file.truncate()
+        file.write(str(start + count))
+        file.flush()
+        os.fsync(file.fileno())
+    return range(start, start + count)
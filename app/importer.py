@@ -0,0 +1,241 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import date, datetime
+from itertools import islice
+
+from app import ids, ledger
+from app.models import MAX_YEAR, MIN_YEAR, Transaction, to_cents
+
+# Rows parsed and checked per batch while the file is streamed.
+BATCH_ROWS = 5000
+
+# Column layouts of the CSV files that can be imported. "planner" is
+# the file written by export_transactions_csv. "bank" is a common
+# statement layout with one signed amount column: money out is
+# negative and becomes an expense, money in becomes income.
+# Other layouts can be given as a JSON file with the same keys.
+LAYOUTS = {
+    "planner": {
+        "date": "date",
+        "date_format": "%Y-%m-%d",
+        "type": "type",
+        "amount": "amount",
+        "category": "category",
+        "note": "note",
+    },
+    "bank": {
+        "date": "Date",
+        "date_format": "%d/%m/%Y",
+        "amount": "Amount",
+        "note": "Description",
+        "default_category": "Imported",
+    },
+}
+
+LAYOUT_DEFAULTS = {
+    "date_format": "%Y-%m-%d",
+    "delimiter": ",",
+    "decimal_comma": False,
+    "type": None,
+    "category": None,
+    "default_category": None,
+    "note": None,
+}
+
+
+def get_layout(name):
+    """
+    Returns a layout by name from LAYOUTS, or read from a JSON file
+    when name is a path. Raises ValueError if there is no such layout.
+    """
+    if name in LAYOUTS:
+        layout = LAYOUTS[name]
+    elif os.path.isfile(name):
+        with open(name, "r", encoding="utf-8") as file:
+            layout = json.load(file)
+    else:
+        choices = ", ".join(LAYOUTS)
+        raise ValueError(
+            f"Unknown layout {name!r}. Use one of: {choices}, "
+            "or a JSON layout file.")
+
+    layout = {**LAYOUT_DEFAULTS, **layout}
+    for key in ("date", "amount"):
+        if not layout.get(key):
+            raise ValueError(f"The layout needs a {key!r} column.")
+    return layout
+
+
+def read_batches(path, layout):
+    """
+    Streams the CSV file and yields lists of up to BATCH_ROWS
+    (line number, row dict) pairs.
+    """
+    with open(path, "r", newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file, delimiter=layout["delimiter"])
+        missing = [
+            layout[key] for key in ("date", "amount", "type", "category",
+                                    "note")
+            if layout[key] and layout[key] not in (reader.fieldnames or [])
+        ]
+        if missing:
+            raise ValueError(
+                f"Missing column(s) in {path}: {', '.join(missing)}")
+
+        # Line 1 is the header.
+        rows = enumerate(reader, start=2)
+        while True:
+            batch = list(islice(rows, BATCH_ROWS))
+            if not batch:
+                return
+            yield batch
+
+
+def date_parser(layout):
+    """
+    Returns a function that turns a date string into a date.
+    Each distinct string is parsed once; statements repeat the same
+    dates on many rows.
+    """
+    date_format = layout["date_format"]
+    cache = {}
+
+    def parse(text):
+        day = cache.get(text)
+        if day is None:
+            try:
+                if date_format == "%Y-%m-%d":
+                    day = date.fromisoformat(text)
+                else:
+                    day = datetime.strptime(text, date_format).date()
+            except ValueError:
+                raise ValueError(f"Invalid date {text!r}.") from None
+            if not MIN_YEAR <= day.year <= MAX_YEAR:
+                raise ValueError(
+                    f"Year must be between {MIN_YEAR} and {MAX_YEAR}.")
+            cache[text] = day
+        return day
+
+    return parse
+
+
+def parse_amount(text, layout):
+    # Returns integer cents; decimal_comma layouts write 1.250,50.
+    text = text.strip()
+    if layout["decimal_comma"]:
+        text = text.replace(".", "").replace(",", ".")
+    return to_cents(text)
+
+
+def parse_batch(batch, layout, parse_date):
+    """
+    Checks one batch of rows.
+    Returns (values, errors): values holds
+    (day, type, category, cents, note) for each valid row and errors
+    holds (line number, message) for each invalid one.
+    """
+    values = []
+    errors = []
+    for line, row in batch:
+        try:
+            day = parse_date((row[layout["date"]] or "").strip())
+            cents = parse_amount(row[layout["amount"]] or "", layout)
+            if layout["type"]:
+                t_type = (row[layout["type"]] or "").strip().lower()
+                if t_type not in ("income", "expense"):
+                    raise ValueError(f"Invalid type {t_type!r}.")
+            else:
+                t_type = "expense" if cents < 0 else "income"
+                cents = abs(cents)
+            if cents <= 0:
+                raise ValueError("Amount must be greater than 0.")
+
+            category = ""
+            if layout["category"]:
+                category = (row[layout["category"]] or "").strip()
+            category = category or layout["default_category"] or ""
+            if not category:
+                raise ValueError("Category cannot be empty.")
+
+            note = ""
+            if layout["note"]:
+                note = (row[layout["note"]] or "").strip()
+        except ValueError as error:
+            errors.append((line, str(error)))
+            continue
+
+        values.append((day, t_type, category.title(), cents, note))
+    return values, errors
+
+
+def duplicate_key(day_ordinal, t_type, category, cents, note):
+    # Rows with the same key are treated as the same transaction.
+    return (day_ordinal, t_type, category.lower(), cents, note)
+
+
+def prepare_import(data, path, layout):
+    """
+    Reads and checks a CSV file without saving anything.
+    Rows already in the ledger are skipped: a row counts as a
+    duplicate while the file has no more copies of it than the
+    ledger, so re-importing a statement adds nothing but two equal
+    rows on the same day are kept the first time.
+    Ids are given out by save_import, so a dry run reserves none.
+    Returns a dict with keys: transactions, duplicates, errors, rows
+    """
+    existing = Counter(
+        duplicate_key(t.day, t.type, t.category, t.amount_cents, t.note)
+        for t in data["transactions"]
+    )
+    seen = Counter()
+    parse_date = date_parser(layout)
+
+    transactions = []
+    duplicates = 0
+    errors = []
+    rows = 0
+
+    for batch in read_batches(path, layout):
+        rows += len(batch)
+        values, batch_errors = parse_batch(batch, layout, parse_date)
+        errors.extend(batch_errors)
+
+        for day, t_type, category, cents, note in values:
+            day_ordinal = day.toordinal()
+            key = duplicate_key(day_ordinal, t_type, category, cents, note)
+            seen[key] += 1
+            if seen[key] <= existing[key]:
+                duplicates += 1
+                continue
+
+            # Values are checked above, so the fast constructor is used.
+            transactions.append(Transaction.from_columns(
+                None, day_ordinal, day.year * 100 + day.month,
+                t_type, category, cents, note))
+
+    return {
+        "transactions": transactions,
+        "duplicates": duplicates,
+        "errors": errors,
+        "rows": rows,
+    }
+
+
+def save_import(data, storage, transactions):
+    """
+    Gives prepared transactions one block of new ids, saves them with
+    the backend's bulk write and adds them to the loaded data.
+    Returns the seconds it took.
+    """
+    start = time.perf_counter()
+    if transactions:
+        first_id = ids.get_allocator(data, storage).allocate(
+            len(transactions))
+        for number, t in enumerate(transactions):
+            t.id = first_id + number
+        storage.append_transactions(transactions)
+        ledger.add_transactions(data, transactions)
+    return time.perf_counter() - start
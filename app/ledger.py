@@ -0,0 +1,340 @@
+from bisect import bisect_right, insort
+
+from app import columnar
+from app.models import Budget, month_key
+
+
+def transaction_day(transaction):
+    return transaction.day
+
+
+def transaction_year(transaction):
+    return transaction.month // 100
+
+
+def build_index(data, totals=None):
+    """
+    Adds the month index and running totals to loaded data.
+    data["by_month"] maps a packed month (e.g. 202601) to that month's
+    transactions, sorted by date, so reports only touch the month they
+    show. data["totals"] maps a packed month to
+    {(type, category): total cents}. A backend that can aggregate
+    by itself passes the totals in instead.
+    """
+    by_month = {}
+    data["totals"] = {}
+    use_columns = totals is None and columnar.available()
+    for t in data["transactions"]:
+        by_month.setdefault(t.month, []).append(t)
+        if totals is None and not use_columns:
+            add_to_totals(data, t)
+
+    if totals is not None:
+        data["totals"] = totals
+    elif use_columns:
+        data["totals"] = columnar.grouped_totals(get_columns(data))
+
+    for transactions in by_month.values():
+        transactions.sort(key=transaction_day)
+
+    data["by_month"] = by_month
+    data["versions"] = {}
+    return data
+
+
+def get_columns(data):
+    """
+    Returns the NumPy columns for the current transactions,
+    rebuilding them if transactions were added since.
+    """
+    columns = data.get("columns")
+    if columns is None or columns["count"] != len(data["transactions"]):
+        columns = columnar.build_columns(data["transactions"])
+        data["columns"] = columns
+    return columns
+
+
+def month_version(data, month):
+    """
+    Returns the version of a YYYY-MM month: how many times its
+    transactions or budgets have changed since the data was loaded.
+    """
+    return data["versions"].get(month_key(month), 0)
+
+
+def changed_month(data, key):
+    # Moves a packed month to its next version.
+    data["versions"][key] = data["versions"].get(key, 0) + 1
+
+
+def add_to_totals(data, transaction):
+    # Adds one transaction's amount to its month's running totals.
+    month_totals = data["totals"].setdefault(transaction.month, {})
+    key = (transaction.type, transaction.category)
+    month_totals[key] = month_totals.get(key, 0) + transaction.amount_cents
+
+
+def add_transaction(data, transaction):
+    # Adds a new transaction to the data and keeps the index in sync.
+    data["transactions"].append(transaction)
+    insort(
+        data["by_month"].setdefault(transaction.month, []),
+        transaction,
+        key=transaction_day,
+    )
+    add_to_totals(data, transaction)
+    add_to_prefix_sums(data, transaction)
+    changed_month(data, transaction.month)
+    if data.get("by_date") is not None:
+        insort(data["by_date"], transaction, key=transaction_day)
+    if data.get("search") is not None:
+        data["search"].add(transaction)
+
+
+def add_transactions(data, transactions):
+    """
+    Adds many new transactions at once. Each month touched is
+    re-sorted once instead of inserting row by row.
+    """
+    months = set()
+    for t in transactions:
+        data["transactions"].append(t)
+        data["by_month"].setdefault(t.month, []).append(t)
+        add_to_totals(data, t)
+        months.add(t.month)
+
+    for month in months:
+        data["by_month"][month].sort(key=transaction_day)
+        changed_month(data, month)
+    # Rebuilt on next use.
+    data["prefix"] = None
+    data["by_date"] = None
+    data["search"] = None
+
+
+def add_history(data, years, transactions):
+    """
+    Adds the transactions of older years loaded after startup and
+    takes those years off data["unloaded_years"]. Transactions added
+    to them during this session are already in the data and are
+    skipped. The list is kept in year order, like the storage.
+    """
+    years = set(years)
+    known = {
+        t.id for t in data["transactions"] if transaction_year(t) in years}
+    add_transactions(
+        data, [t for t in transactions if t.id not in known])
+    data["transactions"].sort(key=transaction_year)
+    # Column positions follow the list order, so they are rebuilt too.
+    data["columns"] = None
+    data["unloaded_years"] = [
+        year for year in data["unloaded_years"] if year not in years]
+
+
+def get_date_index(data):
+    """
+    Returns all transactions sorted by date, oldest first.
+    The index is built once and kept in order as transactions are
+    added, so views can page through it without sorting.
+    """
+    if data.get("by_date") is None:
+        transactions = data["transactions"]
+        if columnar.available():
+            order = columnar.date_order(get_columns(data))
+            data["by_date"] = [transactions[i] for i in order]
+        else:
+            data["by_date"] = sorted(transactions, key=transaction_day)
+    return data["by_date"]
+
+
+def transactions_page(data, page, size):
+    # Returns page number page (from 0) of all transactions, newest first.
+    by_date = get_date_index(data)
+    end = len(by_date) - page * size
+    return by_date[max(end - size, 0):max(end, 0)][::-1]
+
+
+def page_of_date(data, day, size):
+    """
+    Returns the page (newest first) holding the newest transaction on
+    or before the day ordinal, or the last page if there is none.
+    """
+    by_date = get_date_index(data)
+    newer = len(by_date) - bisect_right(by_date, day, key=transaction_day)
+    last_page = max(len(by_date) - 1, 0) // size
+    return min(newer // size, last_page)
+
+
+def transactions_for_month(data, month):
+    # Returns the transactions of one YYYY-MM month, oldest first.
+    return data["by_month"].get(month_key(month), [])
+
+
+def category_totals(data, month, t_type):
+    # Returns {category: total cents} for one YYYY-MM month and type.
+    return {
+        category: total
+        for (row_type, category), total in data["totals"].get(
+            month_key(month), {}).items()
+        if row_type == t_type
+    }
+
+
+def month_summary(data, month):
+    # Returns (income cents, expense cents) for one YYYY-MM month.
+    income_total = 0
+    expense_total = 0
+    for (t_type, _), total in data["totals"].get(
+            month_key(month), {}).items():
+        if t_type == "income":
+            income_total += total
+        elif t_type == "expense":
+            expense_total += total
+    return income_total, expense_total
+
+
+def budgets_for_month(data, month):
+    # Returns the budgets set for one YYYY-MM month.
+    key = month_key(month)
+    return [b for b in data["budgets"] if b.month == key]
+
+
+def set_budget(data, month, category, limit_cents):
+    # Updates the matching (month, category) budget or adds a new one.
+    changed_month(data, month_key(month))
+    for b in budgets_for_month(data, month):
+        if b.category.lower() == category.strip().lower():
+            b.category = category
+            b.limit_cents = limit_cents
+            return
+
+    data["budgets"].append(Budget(month, category, limit_cents))
+
+
+def month_index(key):
+    # Months since year 0 for a packed month, so months can be counted.
+    return (key // 100) * 12 + key % 100 - 1
+
+
+def build_prefix_sums(data):
+    """
+    Builds cumulative totals over every month from the first to the
+    last one with transactions, from the per-month running totals.
+    prefix["types"][type][i] is the total of the first i months,
+    and prefix["categories"][(type, category)] the same per category,
+    so any range total is one subtraction.
+    """
+    months = data["totals"]
+    if not months:
+        return {"first": None, "size": 0, "types": {}, "categories": {}}
+
+    first = month_index(min(months))
+    size = month_index(max(months)) - first + 1
+
+    types = {t_type: [0] * (size + 1) for t_type in ("income", "expense")}
+    categories = {}
+    for month, month_totals in months.items():
+        i = month_index(month) - first + 1
+        for key, total in month_totals.items():
+            if key not in categories:
+                categories[key] = [0] * (size + 1)
+            categories[key][i] += total
+            types[key[0]][i] += total
+
+    for series in list(types.values()) + list(categories.values()):
+        for i in range(1, size + 1):
+            series[i] += series[i - 1]
+
+    return {
+        "first": first,
+        "size": size,
+        "types": types,
+        "categories": categories,
+    }
+
+
+def get_prefix_sums(data):
+    # Returns the prefix sums, building them on first use.
+    if data.get("prefix") is None:
+        data["prefix"] = build_prefix_sums(data)
+    return data["prefix"]
+
+
+def add_to_prefix_sums(data, transaction):
+    """
+    Adds one new transaction to built prefix sums: every cumulative
+    entry from its month on grows by its amount. A month after the
+    last one extends the tables; a month before the first one drops
+    them so they are rebuilt on the next range report.
+    """
+    prefix = data.get("prefix")
+    if prefix is None:
+        return
+    index = month_index(transaction.month)
+    if prefix["first"] is None or index < prefix["first"]:
+        data["prefix"] = None
+        return
+
+    size = index - prefix["first"] + 1
+    if size > prefix["size"]:
+        grow = size - prefix["size"]
+        for series in (list(prefix["types"].values())
+                       + list(prefix["categories"].values())):
+            series.extend([series[-1]] * grow)
+        prefix["size"] = size
+
+    key = (transaction.type, transaction.category)
+    if key not in prefix["categories"]:
+        prefix["categories"][key] = [0] * (prefix["size"] + 1)
+
+    start = index - prefix["first"] + 1
+    for series in (prefix["types"][transaction.type],
+                   prefix["categories"][key]):
+        for i in range(start, prefix["size"] + 1):
+            series[i] += transaction.amount_cents
+
+
+def range_total(prefix, series, first, last):
+    # Total of series over the YYYY-MM months first..last (inclusive).
+    if prefix["first"] is None:
+        return 0
+    low = month_index(month_key(first)) - prefix["first"]
+    high = month_index(month_key(last)) - prefix["first"] + 1
+    low = min(max(low, 0), prefix["size"])
+    high = min(max(high, 0), prefix["size"])
+    if high <= low:
+        return 0
+    return series[high] - series[low]
+
+
+def overall_summary(data):
+    # Returns (income cents, expense cents) over all transactions.
+    prefix = get_prefix_sums(data)
+    if prefix["first"] is None:
+        return 0, 0
+    return prefix["types"]["income"][-1], prefix["types"]["expense"][-1]
+
+
+def range_summary(data, first, last):
+    # Returns (income cents, expense cents) for months first..last.
+    prefix = get_prefix_sums(data)
+    if prefix["first"] is None:
+        return 0, 0
+    return (
+        range_total(prefix, prefix["types"]["income"], first, last),
+        range_total(prefix, prefix["types"]["expense"], first, last),
+    )
+
+
+def range_category_totals(data, first, last, t_type):
+    # Returns {category: total cents} of one type for months first..last.
+    prefix = get_prefix_sums(data)
+    totals = {}
+    for (row_type, category), series in prefix["categories"].items():
+        if row_type != t_type:
+            continue
+        total = range_total(prefix, series, first, last)
+        if total:
+            totals[category] = total
+    return totals
+
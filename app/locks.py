@@ -0,0 +1,43 @@
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; files are then not locked.
+    fcntl = None
+
+
+def open_lock_file(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return open(path, "a+", encoding="utf-8")
+
+
+@contextlib.contextmanager
+def locked(path):
+    """
+    Holds an exclusive lock on the file at path (created if needed)
+    for the with block. Other processes wait until it is released.
+    """
+    with open_lock_file(path) as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        yield file
+
+
+def try_lock(path):
+    """
+    Takes an exclusive lock on the file at path without waiting.
+    Returns the open file, which keeps the lock until it is closed
+    or the process ends, or None if another process holds it.
+    """
+    file = open_lock_file(path)
+    if fcntl is not None:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return None
+    return file
@@ -0,0 +1,157 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+TRANSACTION_TYPES = ("income", "expense")
+
+# Years accepted for transaction dates.
+MIN_YEAR = 2000
+MAX_YEAR = 3000
+
+
+def to_cents(amount):
+    """
+    Converts an amount such as 12.5, "12.50" or "1,250.50"
+    to integer cents. Raises ValueError for anything else.
+    """
+    if isinstance(amount, str):
+        amount = amount.strip().replace(",", "")
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    return int(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+def format_cents(cents):
+    # Formats integer cents as an amount string, e.g. 1250 -> "12.50".
+    return f"{cents / 100:.2f}"
+
+
+def month_key(month):
+    """
+    Packs a YYYY-MM string into an int, e.g. "2026-01" -> 202601.
+    Returns None if the string is not a valid month.
+    """
+    try:
+        year, month_number = str(month).split("-")
+        year, month_number = int(year), int(month_number)
+    except ValueError:
+        return None
+    if not 1 <= month_number <= 12:
+        return None
+    return year * 100 + month_number
+
+
+def month_str(key):
+    # Unpacks a month int back to YYYY-MM, e.g. 202601 -> "2026-01".
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+
+class Transaction:
+    """
+    One income or expense entry.
+    Values are checked and converted once when the record is built:
+    the date is kept as a day ordinal plus a packed month int and
+    the amount as integer cents.
+    """
+
+    __slots__ = (
+        "id", "day", "month", "type", "category", "amount_cents", "note")
+
+    def __init__(self, t_id, date_str, t_type, category, amount_cents,
+                 note=""):
+        day = date.fromisoformat(str(date_str).strip())
+        t_type = str(t_type).strip().lower()
+        if t_type not in TRANSACTION_TYPES:
+            raise ValueError(f"Invalid transaction type: {t_type!r}")
+
+        self.id = int(t_id)
+        self.day = day.toordinal()
+        self.month = day.year * 100 + day.month
+        self.type = t_type
+        self.category = str(category)
+        self.amount_cents = int(amount_cents)
+        self.note = str(note or "")
+
+    @classmethod
+    def from_dict(cls, values):
+        # Builds a transaction from a dict with an "amount" key.
+        return cls(
+            values["id"],
+            values["date"],
+            values["type"],
+            values["category"],
+            to_cents(values["amount"]),
+            values.get("note", ""),
+        )
+
+    @classmethod
+    def from_columns(cls, t_id, day, month, t_type, category,
+                     amount_cents, note):
+        """
+        Builds a transaction from values that were already checked,
+        e.g. read back from a snapshot, without parsing them again.
+        """
+        transaction = cls.__new__(cls)
+        transaction.id = t_id
+        transaction.day = day
+        transaction.month = month
+        transaction.type = t_type
+        transaction.category = category
+        transaction.amount_cents = amount_cents
+        transaction.note = note
+        return transaction
+
+    @property
+    def date(self):
+        return date.fromordinal(self.day).isoformat()
+
+    @property
+    def amount(self):
+        return self.amount_cents / 100
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "date": self.date,
+            "type": self.type,
+            "category": self.category,
+            "amount": self.amount,
+            "note": self.note,
+        }
+
+
+class Budget:
+    """
+    A spending limit for one category in one month.
+    The month is a packed int and the limit is integer cents.
+    """
+
+    __slots__ = ("month", "category", "limit_cents")
+
+    def __init__(self, month, category, limit_cents):
+        key = month_key(str(month).strip())
+        if key is None:
+            raise ValueError(f"Invalid budget month: {month!r}")
+
+        self.month = key
+        self.category = str(category)
+        self.limit_cents = int(limit_cents)
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(
+            values["month"], values["category"], to_cents(values["limit"]))
+
+    @property
+    def limit(self):
+        return self.limit_cents / 100
+
+    def to_dict(self):
+        return {
+            "month": month_str(self.month),
+            "category": self.category,
+            "limit": self.limit,
+        }
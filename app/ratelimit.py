@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import gspread
+
+# Google Sheets allows 60 read and 60 write requests per minute per
+# user. Each quota class gets a token bucket with a small burst.
+QUOTAS = {
+    "read": {"per_minute": 60, "burst": 10},
+    "write": {"per_minute": 60, "burst": 10},
+}
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+
+_counters = {
+    "requests": 0,
+    "throttled": 0,
+    "retried": 0,
+    "coalesced": 0,
+    "failed": 0,
+}
+_counters_lock = threading.Lock()
+
+# Reads that are running right now, by key, so identical reads
+# started meanwhile wait for the same result.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Allows per_minute requests per minute on average and up to
+    burst requests at once. acquire() waits until a token is free.
+    """
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Takes one token. Returns True if the caller had to wait.
+        waited = False
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            waited = True
+            time.sleep(wait)
+
+
+_buckets = {
+    kind: TokenBucket(quota["per_minute"], quota["burst"])
+    for kind, quota in QUOTAS.items()
+}
+
+
+def configure(kind, per_minute, burst):
+    # Replaces the limits of one quota class.
+    _buckets[kind] = TokenBucket(per_minute, burst)
+
+
+def count(name, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+
+def stats():
+    # Returns a copy of the request counters.
+    with _counters_lock:
+        return dict(_counters)
+
+
+def is_retryable(error):
+    # True for quota (429) and server (5xx) errors.
+    if not isinstance(error, gspread.exceptions.APIError):
+        return False
+    return error.response.status_code in RETRY_STATUS_CODES
+
+
+def backoff_seconds(attempt):
+    # Exponential backoff with full jitter.
+    limit = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, limit)
+
+
+def call(kind, func, *args, **kwargs):
+    """
+    Runs one Sheets API call under the kind ("read" or "write") quota.
+    Waits for a token first, and retries 429 and 5xx errors with
+    jittered exponential backoff, up to MAX_RETRIES times.
+    """
+    bucket = _buckets[kind]
+    attempt = 0
+    while True:
+        if bucket.acquire():
+            count("throttled")
+        count("requests")
+        try:
+            return func(*args, **kwargs)
+        except gspread.exceptions.APIError as error:
+            if not is_retryable(error) or attempt >= MAX_RETRIES:
+                count("failed")
+                raise
+            if error.response.status_code == 429:
+                count("throttled")
+            count("retried")
+            time.sleep(backoff_seconds(attempt))
+            attempt += 1
+
+
+def read(key, func, *args, **kwargs):
+    """
+    Like call("read", ...), but reads with the same key that overlap
+    share one request: later callers wait for the first one's result.
+    """
+    with _in_flight_lock:
+        pending = _in_flight.get(key)
+        if pending is None:
+            pending = Future()
+            _in_flight[key] = pending
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        count("coalesced")
+        return pending.result()
+
+    try:
+        result = call("read", func, *args, **kwargs)
+    except BaseException as error:
+        pending.set_exception(error)
+        raise
+    else:
+        pending.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+
+def write(func, *args, **kwargs):
+    return call("write", func, *args, **kwargs)
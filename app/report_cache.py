@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+# Report results and rendered tables kept at most; the least recently
+# used one is dropped first.
+MAX_ENTRIES = 256
+
+
+class ReportCache:
+    """
+    Remembers computed report results and rendered tables.
+    Keys are (report, YYYY-MM month, month version). The version (see
+    ledger.month_version) changes whenever a transaction or budget of
+    that month is saved, so a write makes only that month's entries
+    unreachable; they then age out like any unused entry.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        # Returns the cached value for key, computing it if missing.
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+
+def get_cache(data):
+    # Returns the report cache of the loaded data, creating it if needed.
+    if data.get("report_cache") is None:
+        data["report_cache"] = ReportCache()
+    return data["report_cache"]
@@ -0,0 +1,166 @@
+import heapq
+import re
+from bisect import bisect_left, bisect_right, insort
+from math import inf
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    # Returns the lowercase words of a note, category or query.
+    return WORD_PATTERN.findall(text.lower())
+
+
+def transaction_amount(transaction):
+    return transaction.amount_cents
+
+
+def transaction_day(transaction):
+    return transaction.day
+
+
+def newest_first(transaction):
+    return (transaction.day, transaction.id)
+
+
+def range_bounds(transactions, key, low, high):
+    # Returns the slice of a sorted list with keys in low..high.
+    start = bisect_left(transactions, low, key=key)
+    stop = bisect_right(transactions, high, key=key)
+    return start, max(start, stop)
+
+
+class SearchIndex:
+    """
+    Finds transactions by the words of their note and category, an
+    amount range and a date range without scanning the ledger.
+    postings maps each word to the set of transactions using it, and
+    vocabulary keeps the words sorted so a query word can match every
+    word it starts. by_amount and by_day hold the transactions sorted
+    for the range filters.
+    """
+
+    def __init__(self, transactions):
+        self.postings = {}
+        # Notes and categories repeat a lot, so each text is split once.
+        self.words = {}
+        for t in transactions:
+            self.add_words(t)
+        self.vocabulary = sorted(self.postings)
+        self.by_amount = sorted(transactions, key=transaction_amount)
+        self.by_day = sorted(transactions, key=transaction_day)
+
+    def text_words(self, text):
+        words = self.words.get(text)
+        if words is None:
+            words = self.words[text] = tokenize(text)
+        return words
+
+    def add_words(self, transaction):
+        # Adds the transaction to the postings of its words.
+        # Returns the words that were not in the index yet.
+        new_words = []
+        for text in (transaction.category, transaction.note):
+            for word in self.text_words(text):
+                postings = self.postings.get(word)
+                if postings is None:
+                    postings = self.postings[word] = set()
+                    new_words.append(word)
+                postings.add(transaction)
+        return new_words
+
+    def add(self, transaction):
+        # Adds a new transaction to every part of the index.
+        for word in self.add_words(transaction):
+            insort(self.vocabulary, word)
+        insort(self.by_amount, transaction, key=transaction_amount)
+        insort(self.by_day, transaction, key=transaction_day)
+
+    def matching(self, word):
+        """
+        Returns the set of transactions with a word starting with
+        word. A word matching a single index word returns its postings
+        as they are, so the result must not be changed.
+        """
+        start = bisect_left(self.vocabulary, word)
+        stop = start
+        while (stop < len(self.vocabulary)
+               and self.vocabulary[stop].startswith(word)):
+            stop += 1
+        if stop - start == 1:
+            return self.postings[self.vocabulary[start]]
+        matches = set()
+        for index_word in self.vocabulary[start:stop]:
+            matches.update(self.postings[index_word])
+        return matches
+
+    def find(self, words=(), min_cents=None, max_cents=None,
+             first_day=None, last_day=None):
+        """
+        Returns the transactions matching every given filter, in no
+        particular order. Each query word must start a word of the
+        note or category; the amount (cents) and day ordinal limits
+        are inclusive and None leaves that end open.
+        Only the smallest candidate list is read in full: the postings
+        of the rarest word or a slice of one sorted index. The other
+        filters are applied to what it holds.
+        """
+        word_sets = sorted(
+            (self.matching(word) for word in words), key=len)
+        has_amount = min_cents is not None or max_cents is not None
+        has_day = first_day is not None or last_day is not None
+        min_cents = -inf if min_cents is None else min_cents
+        max_cents = inf if max_cents is None else max_cents
+        first_day = -inf if first_day is None else first_day
+        last_day = inf if last_day is None else last_day
+
+        # (size, name) of each candidate list.
+        candidates = []
+        if word_sets:
+            candidates.append((len(word_sets[0]), "words"))
+        if has_amount:
+            amount_low, amount_high = range_bounds(
+                self.by_amount, transaction_amount, min_cents, max_cents)
+            candidates.append((amount_high - amount_low, "amount"))
+        if has_day:
+            day_low, day_high = range_bounds(
+                self.by_day, transaction_day, first_day, last_day)
+            candidates.append((day_high - day_low, "day"))
+        if not candidates:
+            return list(self.by_day)
+
+        size, name = min(candidates)
+        if size == 0:
+            return []
+        if name == "words":
+            matches = word_sets.pop(0)
+        elif name == "amount":
+            matches = self.by_amount[amount_low:amount_high]
+            has_amount = False
+        else:
+            matches = self.by_day[day_low:day_high]
+            has_day = False
+
+        # Set intersection runs in C, far faster than testing each
+        # transaction in Python, and leaves fewer for the checks below.
+        for word_set in word_sets:
+            matches = word_set.intersection(matches)
+        if has_amount:
+            matches = [
+                t for t in matches
+                if min_cents <= t.amount_cents <= max_cents]
+        if has_day:
+            matches = [t for t in matches if first_day <= t.day <= last_day]
+        return list(matches)
+
+
+def get_index(data):
+    # Returns the search index, building it on first use.
+    if data.get("search") is None:
+        data["search"] = SearchIndex(data["transactions"])
+    return data["search"]
+
+
+def newest(transactions, count):
+    # Returns up to count transactions, newest first.
+    return heapq.nlargest(count, transactions, key=newest_first)
@@ -3,8 +3,11 @@ import os
 
 import gspread
 from dotenv import load_dotenv
+from google.auth.exceptions import RefreshError
 from google.oauth2.service_account import Credentials
 
+from app import ratelimit
+
 load_dotenv()
 
 SCOPE = [
@@ -13,6 +16,16 @@ SCOPE = [
     "https://www.googleapis.com/auth/drive",
 ]
 
+# Connection state shared by the whole session. The client is authorized
+# once, the spreadsheet is looked up once and the worksheets are cached,
+# so later reads and writes go straight to the Sheets API.
+_session = {
+    "client": None,
+    "spreadsheet_key": None,
+    "spreadsheet": None,
+    "worksheets": {},
+}
+
 
 def get_client():
     creds_json = os.environ.get("CREDS")
@@ -24,22 +37,149 @@ def get_client():
     return gspread.authorize(creds)
 
 
+def get_session_client():
+    # Returns the authorized client, creating it on first use.
+    if _session["client"] is None:
+        _session["client"] = get_client()
+    return _session["client"]
+
+
 def open_sheet():
-    sheet_name = os.environ.get("SHEET_NAME")
-    if not sheet_name:
-        raise ValueError("Missing SHEET_NAME environment variable.")
+    """
+    Returns the spreadsheet for this session.
+    Uses SHEET_KEY when it is set, otherwise looks the sheet up by
+    SHEET_NAME once and remembers its key for reconnects.
+    """
+    if _session["spreadsheet"] is not None:
+        return _session["spreadsheet"]
+
+    client = get_session_client()
+    key = _session["spreadsheet_key"] or os.environ.get("SHEET_KEY")
+
+    if key:
+        spreadsheet = ratelimit.read(
+            ("open_by_key", key), client.open_by_key, key)
+    else:
+        sheet_name = os.environ.get("SHEET_NAME")
+        if not sheet_name:
+            raise ValueError("Missing SHEET_NAME environment variable.")
+        spreadsheet = ratelimit.read(
+            ("open", sheet_name), client.open, sheet_name)
+
+    _session["spreadsheet_key"] = spreadsheet.id
+    _session["spreadsheet"] = spreadsheet
+    return spreadsheet
+
+
+def get_worksheet(name):
+    # Returns a cached worksheet handle from the session spreadsheet.
+    worksheets = _session["worksheets"]
+    if name not in worksheets:
+        spreadsheet = open_sheet()
+        worksheets[name] = ratelimit.read(
+            ("worksheet", name), spreadsheet.worksheet, name)
+    return worksheets[name]
+
+
+def get_worksheet_titles():
+    """
+    Returns the titles of all worksheets, read with one request.
+    Their handles are cached for get_worksheet.
+    """
+    spreadsheet = open_sheet()
+    worksheets = ratelimit.read(("worksheets",), spreadsheet.worksheets)
+    for ws in worksheets:
+        _session["worksheets"].setdefault(ws.title, ws)
+    return [ws.title for ws in worksheets]
+
+
+def get_or_add_worksheet(name, rows=1, cols=2):
+    """
+    Returns a worksheet, adding it to the spreadsheet first if it
+    does not exist yet.
+    """
+    try:
+        return get_worksheet(name)
+    except gspread.exceptions.WorksheetNotFound:
+        pass
+
+    spreadsheet = open_sheet()
+    try:
+        ws = ratelimit.write(
+            spreadsheet.add_worksheet, name, rows=rows, cols=cols)
+    except gspread.exceptions.APIError:
+        # Another session added it in the meantime.
+        return get_worksheet(name)
+    _session["worksheets"][name] = ws
+    return ws
+
+
+def rename_worksheet(name, new_name):
+    # Renames a worksheet and moves its cached handle to the new name.
+    ws = get_worksheet(name)
+    ratelimit.write(ws.update_title, new_name)
+    _session["worksheets"][new_name] = _session["worksheets"].pop(name)
+
+
+def get_ranges(ranges):
+    """
+    Reads several A1 ranges (e.g. "budgets" or "transactions!A5:F")
+    with one values_batch_get request.
+    Returns a list of row lists, one per range.
+    """
+    spreadsheet = open_sheet()
+    response = ratelimit.read(
+        ("values_batch_get", tuple(ranges)),
+        spreadsheet.values_batch_get, ranges)
+    return [
+        value_range.get("values", [])
+        for value_range in response.get("valueRanges", [])
+    ]
+
+
+def reset_session():
+    """
+    Drops the client and worksheet handles so the next call
+    authorizes again. The spreadsheet key is kept.
+    """
+    _session["client"] = None
+    _session["spreadsheet"] = None
+    _session["worksheets"] = {}
+
+
+def is_auth_error(error):
+    # True if the error means the session credentials are no longer valid.
+    if isinstance(error, RefreshError):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code == 401
+    return False
+
+
+def with_reconnect(action):
+    """
+    Runs action() against the cached session. Access tokens are refreshed
+    by the authorized session itself; if auth has expired anyway, the
+    session is rebuilt once and the action is retried.
+    """
+    try:
+        return action()
+    except (gspread.exceptions.APIError, RefreshError) as error:
+        if not is_auth_error(error):
+            raise
+        reset_session()
+        return action()
+
 
-    client = get_client()
-    return client.open(sheet_name)
+def read_records(name):
+    # Returns all records of one worksheet.
+    ws = get_worksheet(name)
+    return ratelimit.read(("get_all_records", name), ws.get_all_records)
 
 
 def get_transactions():
-    sheet = open_sheet()
-    ws = sheet.worksheet("transactions")
-    return ws.get_all_records()
+    return with_reconnect(lambda: read_records("transactions"))
 
 
 def get_budgets():
-    sheet = open_sheet()
-    ws = sheet.worksheet("budgets")
-    return ws.get_all_records()
\ No newline at end of file
+    return with_reconnect(lambda: read_records("budgets"))
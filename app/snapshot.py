@@ -0,0 +1,181 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections.abc import Sequence
+
+from app.models import Transaction
+
+MAGIC = b"PBPS"
+VERSION = 1
+
+# magic, version, reserved, transaction count, payload size, crc32
+HEADER = struct.Struct("<4sHHIII")
+HEADER_SIZE = 24
+
+TYPE_CODES = {"income": 0, "expense": 1}
+TYPE_NAMES = ("income", "expense")
+
+# Column name -> array typecode, in file order.
+COLUMNS = [
+    ("id", "q"),
+    ("day", "i"),
+    ("month", "i"),
+    ("type", "B"),
+    ("category", "I"),
+    ("cents", "q"),
+    ("note", "I"),
+]
+
+
+def padded(data):
+    # Pads bytes to a multiple of 8 so every column starts aligned.
+    return data + b"\0" * (-len(data) % 8)
+
+
+def write_snapshot(path, transactions, meta):
+    """
+    Saves transactions as a binary snapshot: column arrays plus
+    one interned string table for categories and notes. meta is a
+    small JSON-able dict stored alongside (budgets, sync info).
+    The file is written to a temporary path and moved into place.
+    """
+    strings = {}
+
+    def intern(text):
+        return strings.setdefault(text, len(strings))
+
+    columns = {name: array(code) for name, code in COLUMNS}
+    for t in transactions:
+        columns["id"].append(t.id)
+        columns["day"].append(t.day)
+        columns["month"].append(t.month)
+        columns["type"].append(TYPE_CODES[t.type])
+        columns["category"].append(intern(t.category))
+        columns["cents"].append(t.amount_cents)
+        columns["note"].append(intern(t.note))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = array("I", [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    parts = [
+        padded(struct.pack("<I", len(meta_bytes)) + meta_bytes),
+        padded(struct.pack("<I", len(encoded))),
+        padded(offsets.tobytes()),
+        padded(b"".join(encoded)),
+    ]
+    parts.extend(padded(columns[name].tobytes()) for name, _ in COLUMNS)
+    payload = b"".join(parts)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, len(transactions), len(payload),
+        zlib.crc32(payload))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(padded(header))
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotTransactions(Sequence):
+    """
+    The transactions of a memory-mapped snapshot.
+    Columns are read straight from the mapped file and a Transaction
+    is only built when a row is accessed; strings are decoded on
+    first use.
+    """
+
+    def __init__(self, view, count, string_offsets, string_blob, columns):
+        self._view = view
+        self._count = count
+        self._string_offsets = string_offsets
+        self._string_blob = string_blob
+        self._strings = [None] * (len(string_offsets) - 1)
+        self._columns = columns
+
+    def __len__(self):
+        return self._count
+
+    def string(self, index):
+        text = self._strings[index]
+        if text is None:
+            start = self._string_offsets[index]
+            end = self._string_offsets[index + 1]
+            text = str(self._string_blob[start:end], "utf-8")
+            self._strings[index] = text
+        return text
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("snapshot index out of range")
+
+        c = self._columns
+        return Transaction.from_columns(
+            c["id"][index],
+            c["day"][index],
+            c["month"][index],
+            TYPE_NAMES[c["type"][index]],
+            self.string(c["category"][index]),
+            c["cents"][index],
+            self.string(c["note"][index]),
+        )
+
+
+def read_snapshot(path):
+    """
+    Memory-maps a snapshot written by write_snapshot.
+    Returns its meta dict with the transactions added under
+    "transactions", or None if the file is missing, from another
+    format version or fails its checksum, so the caller rebuilds
+    from the source of truth.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE:
+        return None
+
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    magic, version, _, count, size, checksum = HEADER.unpack_from(view)
+    payload = view[HEADER_SIZE:HEADER_SIZE + size]
+    if (magic != MAGIC or version != VERSION or len(payload) != size
+            or zlib.crc32(payload) != checksum):
+        return None
+
+    position = 0
+
+    def take(length):
+        nonlocal position
+        chunk = payload[position:position + length]
+        position += length + (-length % 8)
+        return chunk
+
+    (meta_size,) = struct.unpack_from("<I", payload, 0)
+    meta = json.loads(bytes(take(4 + meta_size)[4:]))
+    (string_count,) = struct.unpack_from("<I", take(4))
+    string_offsets = take(4 * (string_count + 1)).cast("I")
+    string_blob = take(string_offsets[-1])
+
+    columns = {}
+    for name, code in COLUMNS:
+        columns[name] = take(count * array(code).itemsize).cast(code)
+
+    meta["transactions"] = SnapshotTransactions(
+        view, count, string_offsets, string_blob, columns)
+    return meta
@@ -1,10 +1,50 @@
+import contextlib
 import json
 import os
+import threading
+
+from app import locks
+from app.ids import reserve_from_file
+from app.ledger import build_index
+from app.models import Budget, Transaction, to_cents
 
 DATA_FILE_PATH = os.path.join("data", "budget_data.json")
+JOURNAL_FILE_PATH = os.path.join("data", "budget_journal.jsonl")
+ID_COUNTER_FILE_PATH = os.path.join("data", "next_id")
+# Locked by every session while it reads or changes the journal.
+LOCK_FILE_PATH = os.path.join("data", "budget_journal.lock")
 
+# Ids are reserved one at a time; the counter file is local.
+ID_BLOCK_SIZE = 1
 
-def load_data():
+# Once the journal grows past this size it is folded into the snapshot.
+COMPACT_AFTER_BYTES = 256 * 1024
+
+# The snapshot plus replayed journal, kept so changes can be applied
+# to it. "seq" is the number of the last journal record applied.
+# journal_bytes is how far this session has read the journal and
+# journal_head its first line, which changes when it is compacted.
+_state = {
+    "data": None,
+    "journal_bytes": 0,
+    "journal_head": b"",
+    "compactor": None,
+}
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def journal_lock():
+    """
+    Holds _lock and the lock file, so only one thread of one session
+    at a time reads or changes the journal and snapshot.
+    """
+    with _lock:
+        with locks.locked(LOCK_FILE_PATH):
+            yield
+
+
+def read_json(path):
     """
     Loads budget data from a JSON file.
     Returns a dictionary with keys: 'transactions' and 'budgets'.
@@ -12,11 +52,11 @@ def load_data():
     """
     default_data = {"transactions": [], "budgets": []}
 
-    if not os.path.exists(DATA_FILE_PATH):
+    if not os.path.exists(path):
         return default_data
 
     try:
-        with open(DATA_FILE_PATH, "r", encoding="utf-8") as file:
+        with open(path, "r", encoding="utf-8") as file:
             data = json.load(file)
 
         if not isinstance(data, dict):
@@ -30,11 +70,277 @@ def load_data():
         return default_data
 
 
-def save_data(data):
+def write_json(data, path):
     """
     Saves budget data to a JSON file.
+    The data is written to a temporary file first and then moved
+    into place, so a crash never leaves a half-written file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_journal():
+    """
+    Returns the records in the journal file.
+    A line cut short by a crash is skipped.
+    """
+    if not os.path.exists(JOURNAL_FILE_PATH):
+        return []
+
+    records = []
+    with open(JOURNAL_FILE_PATH, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def repair_journal():
     """
-    os.makedirs("data", exist_ok=True)
+    Cuts off a last line left unfinished by a crash, so the next
+    record is not appended onto it.
+    """
+    if not os.path.exists(JOURNAL_FILE_PATH):
+        return
+
+    with open(JOURNAL_FILE_PATH, "rb+") as file:
+        content = file.read()
+        if content and not content.endswith(b"\n"):
+            file.truncate(content.rfind(b"\n") + 1)
+
+
+def apply_record(raw, record):
+    # Applies one journal record to the loaded data.
+    if record["op"] == "transaction":
+        raw["transactions"].append(record["data"])
+    elif record["op"] == "transactions":
+        raw["transactions"].extend(record["data"])
+    elif record["op"] == "budget":
+        apply_budget(raw, record["data"])
+    raw["seq"] = record["seq"]
+
+
+def apply_budget(raw, budget):
+    """
+    Updates the matching (month, category) budget or adds it.
+    Returns True if an existing budget was updated.
+    """
+    category_norm = budget["category"].strip().lower()
+    for b in raw["budgets"]:
+        if (b["month"] == budget["month"] and
+                b["category"].strip().lower() == category_norm):
+            b["category"] = budget["category"]
+            b["limit"] = budget["limit"]
+            return True
+
+    raw["budgets"].append(dict(budget))
+    return False
+
+
+def read_state():
+    """
+    Reads the snapshot and replays the journal on top of it.
+    Records already folded into the snapshot (seq at or below the
+    snapshot's seq) are skipped. Callers hold journal_lock.
+    """
+    raw = read_json(DATA_FILE_PATH)
+    raw.setdefault("seq", 0)
+    repair_journal()
+    for record in read_journal():
+        if record.get("seq", 0) > raw["seq"]:
+            apply_record(raw, record)
+
+    _state["data"] = raw
+    _state["journal_bytes"] = 0
+    _state["journal_head"] = b""
+    if os.path.exists(JOURNAL_FILE_PATH):
+        _state["journal_bytes"] = os.path.getsize(JOURNAL_FILE_PATH)
+        with open(JOURNAL_FILE_PATH, "rb") as file:
+            _state["journal_head"] = file.readline()
+    return raw
+
+
+def read_new_records():
+    """
+    Brings the loaded data up to date with the records other
+    sessions appended since this one last read the journal. If the
+    journal was compacted in the meantime (its first line changed),
+    everything is read again. Callers hold journal_lock.
+    Returns the loaded data.
+    """
+    raw = _state["data"]
+    if raw is None:
+        return read_state()
+
+    head = b""
+    if os.path.exists(JOURNAL_FILE_PATH):
+        with open(JOURNAL_FILE_PATH, "rb") as file:
+            head = file.readline()
+            if head == _state["journal_head"]:
+                file.seek(_state["journal_bytes"])
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        # Cut short by a crash; repaired on next read.
+                        break
+                    record = json.loads(line)
+                    if record["seq"] > raw["seq"]:
+                        apply_record(raw, record)
+                    _state["journal_bytes"] += len(line)
+                return raw
+
+    if head == _state["journal_head"]:
+        return raw
+    return read_state()
+
 
-    with open(DATA_FILE_PATH, "w", encoding="utf-8") as file:
-        json.dump(data, file, indent=2)
\ No newline at end of file
+def load_data():
+    """
+    Loads transactions and budgets from the local JSON snapshot
+    and journal.
+    Returns a dict with keys: transactions, budgets
+    """
+    with journal_lock():
+        raw = read_state()
+        transactions = [Transaction.from_dict(t) for t in raw["transactions"]]
+        budgets = [Budget.from_dict(b) for b in raw["budgets"]]
+
+    return build_index({
+        "transactions": transactions,
+        "budgets": budgets,
+    })
+
+
+def load_years(years):
+    # Every year is loaded by load_data.
+    return []
+
+
+def append_record(op, data):
+    """
+    Adds one record to the end of the journal with a single write,
+    then starts compaction if the journal has grown too big.
+    Records from other sessions are read first, so the new record's
+    seq follows theirs. Callers hold journal_lock.
+    """
+    raw = read_new_records()
+    record = {"seq": raw["seq"] + 1, "op": op, "data": data}
+    line = (json.dumps(record) + "\n").encode("utf-8")
+
+    directory = os.path.dirname(JOURNAL_FILE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    fd = os.open(
+        JOURNAL_FILE_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    if not _state["journal_bytes"]:
+        _state["journal_head"] = line
+    _state["journal_bytes"] += len(line)
+    apply_record(raw, record)
+
+    if _state["journal_bytes"] > COMPACT_AFTER_BYTES:
+        start_compaction()
+
+
+def append_transaction(transaction):
+    # Adds one Transaction to the journal.
+    with journal_lock():
+        append_record("transaction", transaction.to_dict())
+
+
+def append_transactions(transactions):
+    # Adds many Transactions as one journal record.
+    with journal_lock():
+        append_record("transactions", [t.to_dict() for t in transactions])
+
+
+def upsert_budget(month: str, category: str, limit: float) -> bool:
+    """
+    Update budget if (month, category) exists, otherwise append.
+    Returns True if updated, False if appended.
+    """
+    budget = {
+        "month": month.strip(),
+        "category": category.strip(),
+        "limit": to_cents(limit) / 100,
+    }
+    category_norm = budget["category"].lower()
+
+    with journal_lock():
+        updated = any(
+            b["month"] == budget["month"] and
+            b["category"].strip().lower() == category_norm
+            for b in read_new_records()["budgets"]
+        )
+        append_record("budget", budget)
+    return updated
+
+
+def reserve_ids(count, floor):
+    # Reserves count ids above floor from the locked counter file.
+    return reserve_from_file(ID_COUNTER_FILE_PATH, count, floor)
+
+
+def start_compaction():
+    # Folds the journal into the snapshot on a background thread.
+    compactor = _state["compactor"]
+    if compactor is not None and compactor.is_alive():
+        return
+
+    compactor = threading.Thread(target=compact, daemon=True)
+    _state["compactor"] = compactor
+    compactor.start()
+
+
+def compact():
+    """
+    Writes the current data as the new snapshot and starts a new
+    journal holding only a "compacted" record with the snapshot's
+    seq. That record gives the new journal a different first line,
+    which tells other sessions to read the state again. The lock is
+    held throughout, so no session appends to the old journal after
+    it has been folded in. If the process stops between the two
+    steps, the old records are skipped on the next load (their seq
+    is not above the snapshot's) instead of applied twice.
+    """
+    with journal_lock():
+        raw = read_new_records()
+        write_json(raw, DATA_FILE_PATH)
+
+        line = (json.dumps({"seq": raw["seq"], "op": "compacted"}) + "\n")
+        line = line.encode("utf-8")
+        tmp_path = JOURNAL_FILE_PATH + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, JOURNAL_FILE_PATH)
+        _state["journal_head"] = line
+        _state["journal_bytes"] = len(line)
+
+
+def flush_transactions():
+    """
+    Transactions are journaled straight away, so nothing is pending.
+    Waits for a running compaction to finish before exit.
+    """
+    compactor = _state["compactor"]
+    if compactor is not None:
+        compactor.join()
+    return 0, 0.0
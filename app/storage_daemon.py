@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from app import locks, snapshot
+from app.daemon import LOG_FILE_PATH, SOCKET_PATH
+from app.ledger import build_index
+from app.models import Budget, Transaction
+
+# The last data received from the service, with its version, so a
+# session started while nothing changed does not fetch it again.
+CACHE_FILE_PATH = os.path.join("data", "daemon_cache.bin")
+
+# How long to wait for a freshly started service to come up.
+START_TIMEOUT_SECONDS = 60
+
+# The service hands out ids from its own blocks, so asking it for
+# one at a time is cheap.
+ID_BLOCK_SIZE = 1
+
+# Folder that holds the app package, so the service can be started
+# from any working directory.
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_connection = {"socket": None, "file": None}
+
+
+def connect():
+    # Opens the connection to the data service.
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        raise
+    _connection["socket"] = sock
+    _connection["file"] = sock.makefile("rwb")
+
+
+def start_service():
+    """
+    Starts the data service in the background and waits until
+    it accepts connections.
+    """
+    os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
+    python_path = os.environ.get("PYTHONPATH")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [PROJECT_DIR] + ([python_path] if python_path else [])))
+    with open(LOG_FILE_PATH, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "app.daemon"],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + START_TIMEOUT_SECONDS
+    while True:
+        try:
+            connect()
+            return
+        except OSError:
+            if process.poll() is not None and process.returncode != 0:
+                raise ConnectionError(
+                    f"The data service stopped. See {LOG_FILE_PATH}.")
+            if time.monotonic() > deadline:
+                raise ConnectionError(
+                    f"The data service did not start. See {LOG_FILE_PATH}.")
+            time.sleep(0.1)
+
+
+def request(op, **fields):
+    """
+    Sends one request to the data service and returns its reply.
+    The service is started if it is not running yet.
+    """
+    if _connection["file"] is None:
+        try:
+            connect()
+        except OSError:
+            start_service()
+
+    file = _connection["file"]
+    file.write(json.dumps({"op": op, **fields}).encode("utf-8") + b"\n")
+    file.flush()
+    line = file.readline()
+    if not line:
+        raise ConnectionError("The data service closed the connection.")
+
+    reply = json.loads(line)
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+def load_data():
+    """
+    Gets the already loaded and indexed data from the service.
+    The version of the local cache is sent along; if the service
+    still has that version, the data comes from the cache instead.
+    Returns a dict with keys: transactions, budgets
+    """
+    cache = snapshot.read_snapshot(CACHE_FILE_PATH) or {}
+    reply = request("load", version=cache.get("version"))
+
+    if reply.get("unchanged"):
+        transactions = list(cache["transactions"])
+        meta = cache
+    else:
+        transactions = [
+            Transaction.from_columns(*row) for row in reply["transactions"]]
+        meta = {
+            "version": reply["version"],
+            "budgets": reply["budgets"],
+            "totals": reply["totals"],
+        }
+        # Sessions starting together may both write the cache.
+        with locks.locked(CACHE_FILE_PATH + ".lock"):
+            snapshot.write_snapshot(CACHE_FILE_PATH, transactions, meta)
+
+    totals = {}
+    for month, t_type, category, total in meta["totals"]:
+        totals.setdefault(month, {})[(t_type, category)] = total
+
+    return build_index({
+        "transactions": transactions,
+        "budgets": [Budget.from_dict(b) for b in meta["budgets"]],
+    }, totals=totals)
+
+
+def load_years(years):
+    # Every year is loaded by the service.
+    return []
+
+
+def append_transaction(transaction):
+    request("append_transaction", transaction=transaction.to_dict())
+
+
+def append_transactions(transactions):
+    request(
+        "append_transactions",
+        transactions=[t.to_dict() for t in transactions])
+
+
+def reserve_ids(count, floor):
+    reply = request("reserve_ids", count=count, floor=floor)
+    return range(reply["start"], reply["start"] + count)
+
+
+def upsert_budget(month: str, category: str, limit: float) -> bool:
+    """
+    Update budget if (month, category) exists, otherwise append.
+    Returns True if updated, False if appended.
+    """
+    reply = request(
+        "upsert_budget", month=month, category=category, limit=limit)
+    return reply["updated"]
+
+
+def flush_transactions():
+    reply = request("flush")
+    return reply["written"], reply["seconds"]
@@ -1,38 +1,455 @@
-from app.sheets import open_sheet
+import os
+from datetime import date
+
+from app import ratelimit, snapshot
+from app.ledger import build_index
+from app.models import Budget, Transaction, to_cents
+from app.sheets import (
+    get_or_add_worksheet, get_ranges, get_worksheet, get_worksheet_titles,
+    rename_worksheet, with_reconnect)
+from app.write_queue import WriteBehindQueue
+
+CACHE_FILE_PATH = os.path.join("data", "sheets_cache.bin")
+TRANSACTION_COLUMNS = ["id", "date", "type", "category", "amount", "note"]
+
+# Rows sent per append_rows request by bulk imports, which keeps each
+# request well under the Sheets API payload limit.
+APPEND_CHUNK_ROWS = 10000
+
+# Ids are reserved through the "sequence" worksheet this many at a
+# time, so most new transactions need no API call for their id.
+ID_BLOCK_SIZE = 1000
+SEQUENCE_SHEET = "sequence"
+
+# Transactions live in one worksheet per year (transactions_2026 and
+# so on), listed in the manifest worksheet with rows: year, worksheet.
+# Spreadsheets from before the split keep every transaction in
+# UNSPLIT_SOURCE; it is split on first load and then renamed.
+MANIFEST_SHEET = "manifest"
+UNSPLIT_SOURCE = "transactions"
+UNSPLIT_SHEET = "transactions_unsplit"
+
+_transaction_queue = None
+
+# (month, normalized category) -> row number in the budgets worksheet.
+_budget_index = {"rows": None, "has_header": False}
+_sequence = {"base": None}
+# Year -> worksheet title, from the manifest.
+_manifest = {"years": None}
+
+
+def get_transaction_queue():
+    # Returns the write-behind queue used for new transactions.
+    global _transaction_queue
+    if _transaction_queue is None:
+        _transaction_queue = WriteBehindQueue(write_transaction_rows)
+    return _transaction_queue
 
 
 def load_data():
     """
     Loads transactions and budgets from Google Sheets.
-    Returns a dict with keys: transactions, budgets
+    Transactions are kept in one worksheet per year, listed in the
+    manifest worksheet. Only the current and later years are loaded
+    here; older ones are listed in data["unloaded_years"] and read
+    by load_years when a report needs them.
+    Loaded years come from the local cache plus any rows appended
+    since the last sync. The manifest, budgets and cached years are
+    read with one batched request.
+    Returns a dict with keys: transactions, budgets, unloaded_years
     """
-    sheet = open_sheet()
+    # A missing, outdated or damaged snapshot means a full reload.
+    cache = snapshot.read_snapshot(CACHE_FILE_PATH) or {}
+    sync = cache.get("sync") or {}
+    if "years" not in sync:
+        # No cache, or one from before transactions were split by year.
+        with_reconnect(prepare_manifest)
+        cache = {}
+        sync = {"years": {}}
+
+    this_year = date.today().year
+    cached_years = {
+        int(year): info for year, info in sync["years"].items()
+        if int(year) >= this_year and info["rows"]
+    }
+    # Row 1 is the header, so the last cached row is rows + 1.
+    ranges = [MANIFEST_SHEET, "budgets"] + [
+        f"{info['sheet']}!A{info['rows'] + 1}:F"
+        for info in cached_years.values()
+    ]
+    manifest_rows, budget_rows, *delta_rows = with_reconnect(
+        lambda: get_ranges(ranges))
+    manifest = parse_manifest(manifest_rows)
+    _manifest["years"] = manifest
+
+    # Years with transactions still spooled are loaded too, so the
+    # ones that did reach the sheet are recognised below.
+    queue = get_transaction_queue()
+    pending_years = {int(t["date"][:4]) for t in queue.pending}
+    wanted = [
+        year for year in sorted(manifest)
+        if year >= this_year or year in pending_years
+    ]
+
+    cached_transactions = {}
+    for t in cache.get("transactions", []):
+        cached_transactions.setdefault(t.month // 100, []).append(t)
+
+    loaded = {}
+    for (year, info), rows in zip(cached_years.items(), delta_rows):
+        if year in wanted and info["sheet"] == manifest[year]:
+            synced = apply_new_transaction_rows(
+                cached_transactions.get(year, []), info, rows)
+            if synced is not None:
+                loaded[year] = synced
+
+    reload = [year for year in wanted if year not in loaded]
+    if reload:
+        year_rows = with_reconnect(
+            lambda: get_ranges([manifest[year] for year in reload]))
+        for year, rows in zip(reload, year_rows):
+            loaded[year] = read_all_transaction_rows(rows)
 
-    transactions_ws = sheet.worksheet("transactions")
-    budgets_ws = sheet.worksheet("budgets")
+    transactions = []
+    sync = {"years": {}}
+    for year in sorted(loaded):
+        year_transactions, info = loaded[year]
+        transactions.extend(year_transactions)
+        sync["years"][str(year)] = {**info, "sheet": manifest[year]}
 
-    transactions = transactions_ws.get_all_records()
-    budgets = budgets_ws.get_all_records()
+    build_budget_index(budget_rows)
+    budgets = parse_budget_rows(budget_rows)
+    budget_dicts = [b.to_dict() for b in budgets]
 
-    return {
+    if sync != cache.get("sync") or budget_dicts != cache.get("budgets"):
+        snapshot.write_snapshot(CACHE_FILE_PATH, transactions, {
+            "budgets": budget_dicts,
+            "sync": sync,
+        })
+
+    # Transactions spooled by an earlier session that never reached
+    # the sheet are shown now and written with the next flush.
+    queue.discard({t.id for t in transactions})
+    transactions = transactions + [
+        Transaction.from_dict(t) for t in queue.pending]
+
+    data = build_index({
         "transactions": transactions,
         "budgets": budgets,
+    })
+    data["unloaded_years"] = [
+        year for year in sorted(manifest) if year not in loaded]
+    return data
+
+
+def load_years(years):
+    """
+    Reads the transactions of years that load_data left out, with
+    one batched request. Returns a list of Transactions.
+    """
+    manifest = get_manifest()
+    years = [year for year in years if year in manifest]
+    if not years:
+        return []
+
+    year_rows = with_reconnect(
+        lambda: get_ranges([manifest[year] for year in years]))
+    transactions = []
+    for rows in year_rows:
+        transactions.extend(read_all_transaction_rows(rows)[0])
+    return transactions
+
+
+def year_sheet_title(year):
+    return f"transactions_{year}"
+
+
+def parse_manifest(rows):
+    # Returns {year: worksheet title} from the manifest values.
+    manifest = {}
+    for row in rows[1:]:
+        year, title = pad_row(row, width=2)
+        if year.isdigit() and title:
+            manifest[int(year)] = title
+    return manifest
+
+
+def get_manifest():
+    # Returns {year: worksheet title}, reading the manifest if needed.
+    if _manifest["years"] is None:
+        rows = with_reconnect(lambda: get_ranges([MANIFEST_SHEET]))[0]
+        _manifest["years"] = parse_manifest(rows)
+    return _manifest["years"]
+
+
+def prepare_manifest():
+    """
+    Makes sure the manifest worksheet exists. A spreadsheet that
+    still keeps every transaction in one worksheet is split by year
+    first, and the old worksheet is renamed to UNSPLIT_SHEET.
+    """
+    titles = get_worksheet_titles()
+    if MANIFEST_SHEET in titles and UNSPLIT_SOURCE not in titles:
+        return
+
+    manifest = {}
+    if UNSPLIT_SOURCE in titles:
+        manifest = split_transactions_sheet()
+
+    # The old worksheet is renamed last: while it is still there, an
+    # interrupted split is simply run again.
+    ws = get_or_add_worksheet(MANIFEST_SHEET)
+    ratelimit.write(ws.clear)
+    ratelimit.write(ws.append_rows, [["year", "worksheet"]] + [
+        [year, manifest[year]] for year in sorted(manifest)])
+
+    if UNSPLIT_SOURCE in titles:
+        rename_worksheet(UNSPLIT_SOURCE, UNSPLIT_SHEET)
+
+
+def split_transactions_sheet():
+    """
+    Copies the rows of the single transactions worksheet into one
+    worksheet per year. Year worksheets left by an interrupted
+    earlier split are cleared first.
+    Returns {year: worksheet title}.
+    """
+    rows = [
+        pad_row(row) for row in get_ranges([UNSPLIT_SOURCE])[0][1:]
+        if any(row)
+    ]
+    rows_by_year = {}
+    last_id = 0
+    for row in rows:
+        t = parse_transaction_row(row)
+        rows_by_year.setdefault(t.month // 100, []).append(row)
+        last_id = max(last_id, t.id)
+
+    manifest = {}
+    for year, year_rows in sorted(rows_by_year.items()):
+        title = year_sheet_title(year)
+        ws = get_or_add_worksheet(title, cols=len(TRANSACTION_COLUMNS))
+        ratelimit.write(ws.clear)
+        year_rows = [TRANSACTION_COLUMNS] + year_rows
+        for start in range(0, len(year_rows), APPEND_CHUNK_ROWS):
+            ratelimit.write(
+                ws.append_rows, year_rows[start:start + APPEND_CHUNK_ROWS])
+        manifest[year] = title
+
+    # Later sessions only load the current year, so the id sequence
+    # is started above every copied id now.
+    get_sequence_base(get_or_add_worksheet(SEQUENCE_SHEET), last_id)
+    return manifest
+
+
+def pad_row(row, width=len(TRANSACTION_COLUMNS)):
+    # Sheets drops trailing empty cells; pad them back as "".
+    row = [str(value) for value in row[:width]]
+    return row + [""] * (width - len(row))
+
+
+def parse_transaction_row(row):
+    # Converts one row of sheet values into a Transaction.
+    t_id, date, t_type, category, amount, note = pad_row(row)
+    return Transaction(t_id, date, t_type, category, to_cents(amount), note)
+
+
+def parse_transaction_rows(rows):
+    # Parses sheet rows, skipping blank ones.
+    return [parse_transaction_row(row) for row in rows if any(row)]
+
+
+def parse_budget_rows(rows):
+    """
+    Converts the budgets worksheet values (header row first)
+    into Budget records. Rows without a month or limit are skipped.
+    """
+    budgets = []
+    for row in rows[1:]:
+        month, category, limit = pad_row(row, width=3)
+        if not month or not limit:
+            continue
+        budgets.append(Budget(month, category, to_cents(limit)))
+    return budgets
+
+
+def apply_new_transaction_rows(transactions, sync, rows):
+    """
+    Adds the rows read from the last synced row of a year worksheet
+    down to that year's cached transactions. The sync info remembers
+    how many data rows the cache holds and the values of the last
+    one. If that row is unchanged, the rows below it are new.
+    Returns (transactions, sync info), or None if the last synced row
+    moved or changed (rows edited or deleted) and a full reload is
+    needed.
+    """
+    if not rows or pad_row(rows[0]) != sync["last_row"]:
+        return None
+
+    new_rows = [pad_row(row) for row in rows[1:]]
+    transactions = list(transactions)
+    transactions.extend(parse_transaction_rows(new_rows))
+    return transactions, {
+        "rows": sync["rows"] + len(new_rows),
+        "last_row": new_rows[-1] if new_rows else sync["last_row"],
+    }
+
+
+def read_all_transaction_rows(rows):
+    """
+    Parses a whole year worksheet (header row first).
+    Returns (transactions, sync info).
+    """
+    rows = [pad_row(row) for row in rows[1:]]
+    return parse_transaction_rows(rows), {
+        "rows": len(rows),
+        "last_row": rows[-1] if rows else None,
     }
 
 
 def append_transaction(transaction):
-    # Appends one transaction row to the transactions worksheet.
-    sheet = open_sheet()
-    ws = sheet.worksheet("transactions")
+    """
+    Queues one Transaction for the transactions worksheet.
+    It is spooled locally right away and written in a batch.
+    """
+    get_transaction_queue().add(transaction.to_dict())
+
+
+def append_transactions(transactions):
+    """
+    Writes many Transactions straight to the sheet, e.g. from an
+    import, with one append_rows request per APPEND_CHUNK_ROWS rows.
+    Queued transactions are written first so ids stay in order.
+    """
+    flush_transactions()
+    for start in range(0, len(transactions), APPEND_CHUNK_ROWS):
+        write_transaction_rows([
+            t.to_dict()
+            for t in transactions[start:start + APPEND_CHUNK_ROWS]
+        ])
+
+
+def write_transaction_rows(transactions):
+    """
+    Appends several transaction dicts to their year worksheets,
+    with a single API call per year.
+    """
+    rows_by_year = {}
+    for t in transactions:
+        rows_by_year.setdefault(int(t["date"][:4]), []).append([
+            t["id"],
+            t["date"],
+            t["type"],
+            t["category"],
+            t["amount"],
+            t["note"],
+        ])
+    for year, rows in rows_by_year.items():
+        with_reconnect(lambda: ratelimit.write(
+            get_year_worksheet(year).append_rows, rows))
+
+
+def get_year_worksheet(year):
+    """
+    Returns the worksheet for one year's transactions. A year that
+    is not in the manifest yet gets its worksheet, with a header
+    row, and its manifest row first.
+    """
+    manifest = get_manifest()
+    if year not in manifest:
+        title = year_sheet_title(year)
+        ws = get_or_add_worksheet(title, cols=len(TRANSACTION_COLUMNS))
+        # Another session may have added it too; the header is the same.
+        ratelimit.write(ws.update, [TRANSACTION_COLUMNS], "A1:F1")
+        ratelimit.write(
+            get_worksheet(MANIFEST_SHEET).append_rows, [[year, title]])
+        manifest[year] = title
+    return get_worksheet(manifest[year])
+
+
+def flush_transactions():
+    """
+    Writes all queued transactions now.
+    Returns (rows written, seconds the write took).
+    """
+    queue = get_transaction_queue()
+    written = queue.close()
+    return written, queue.stats["last_seconds"]
+
+
+def budget_key(month, category):
+    # Index key for a budget row: (month, normalized category).
+    return (str(month).strip(), str(category).strip().lower())
+
+
+def build_budget_index(rows):
+    """
+    Builds the (month, category) -> sheet row number index
+    from the budgets worksheet values, header row included.
+    """
+    index = {}
+    for i, row in enumerate(rows[1:], start=2):
+        row_month = (row[0] if len(row) > 0 else "")
+        row_cat = (row[1] if len(row) > 1 else "")
+        index[budget_key(row_month, row_cat)] = i
 
-    ws.append_row([
-        transaction["id"],
-        transaction["date"],
-        transaction["type"],
-        transaction["category"],
-        transaction["amount"],
-        transaction["note"],
-    ])
+    _budget_index["rows"] = index
+    _budget_index["has_header"] = bool(rows)
+
+
+def get_budget_index():
+    # Returns the budget row index, reading the sheet once if needed.
+    if _budget_index["rows"] is None:
+        ws = get_worksheet("budgets")
+        build_budget_index(
+            ratelimit.read(("get_all_values", "budgets"), ws.get_all_values))
+    return _budget_index["rows"]
+
+
+def appended_row_numbers(response, count):
+    """
+    Returns the sheet row numbers written by an append call,
+    read from the updatedRange in the API response (e.g. budgets!A7:C8).
+    """
+    updated_range = response["updates"]["updatedRange"]
+    first_cell = updated_range.split("!")[-1].split(":")[0]
+    first_row = int("".join(ch for ch in first_cell if ch.isdigit()))
+    return range(first_row, first_row + count)
+
+
+def get_sequence_base(ws, floor):
+    """
+    Returns the first id of block 0, kept in cells A1:B1 of the
+    sequence worksheet. A new worksheet starts above floor.
+    """
+    if _sequence["base"] is None:
+        header = ratelimit.read((SEQUENCE_SHEET, "A1:B1"), ws.get, "A1:B1")
+        if not header or len(header[0]) < 2:
+            header = [["base", floor + 1]]
+            ratelimit.write(ws.update, header, "A1:B1")
+        _sequence["base"] = int(header[0][1])
+    return _sequence["base"]
+
+
+def reserve_ids(count, floor):
+    """
+    Reserves at least count ids by appending one row per block of
+    ID_BLOCK_SIZE to the sequence worksheet. Row 2 is block 0, row 3
+    block 1 and so on, and Sheets appends rows one call at a time,
+    so the row numbers in the reply belong to this session alone.
+    Returns the range of reserved ids.
+    """
+    def reserve():
+        ws = get_or_add_worksheet(SEQUENCE_SHEET)
+        base = get_sequence_base(ws, floor)
+        blocks = -(-count // ID_BLOCK_SIZE)
+        response = ratelimit.write(
+            ws.append_rows, [["block", ID_BLOCK_SIZE]] * blocks)
+        first_row = appended_row_numbers(response, blocks)[0]
+        start = base + (first_row - 2) * ID_BLOCK_SIZE
+        return range(start, start + blocks * ID_BLOCK_SIZE)
+
+    return with_reconnect(reserve)
 
 
 def upsert_budget(month: str, category: str, limit: float) -> bool:
@@ -40,29 +457,69 @@ def upsert_budget(month: str, category: str, limit: float) -> bool:
     Update budget if (month, category) exists, otherwise append.
     Returns True if updated, False if appended.
     """
-    sheet = open_sheet()
-    ws = sheet.worksheet("budgets")
+    return upsert_budgets([(month, category, limit)])[0]
 
-    month = month.strip()
-    category_norm = category.strip().lower()
 
-    rows = ws.get_all_values()
+def upsert_budgets(budgets):
+    """
+    Saves several (month, category, limit) budgets at once.
+    Existing rows are found in the index and updated with one
+    batch_update call, new rows are added with one append_rows call.
+    Returns a list with True for each updated and False for each
+    appended budget.
+    """
+    return with_reconnect(lambda: _upsert_budgets(budgets))
 
-    if not rows:
-        ws.append_row(["month", "category", "limit"])
-        ws.append_row([month, category.strip(), str(limit)])
-        return False
 
-    for i, row in enumerate(rows[1:], start=2):
-        row_month = (row[0].strip() if len(row) > 0 else "")
-        row_cat = (row[1].strip().lower() if len(row) > 1 else "")
+def _upsert_budgets(budgets):
+    ws = get_worksheet("budgets")
+    index = get_budget_index()
+
+    updates = []
+    new_rows = []
+    new_keys = []
+    results = []
+
+    for month, category, limit in budgets:
+        key = budget_key(month, category)
+        if key in index:
+            updates.append({
+                "range": f"C{index[key]}",
+                "values": [[str(limit)]],
+            })
+            results.append(True)
+        elif key in new_keys:
+            # Same budget twice in one batch: keep the last limit.
+            new_rows[new_keys.index(key)][2] = str(limit)
+            results.append(True)
+        else:
+            new_rows.append([month.strip(), category.strip(), str(limit)])
+            new_keys.append(key)
+            results.append(False)
+
+    if updates:
+        ratelimit.write(
+            ws.batch_update, updates, value_input_option="USER_ENTERED")
 
-        if row_month == month and row_cat == category_norm:
-            ws.update_cell(i, 3, str(limit))
-            return True
+    if new_rows:
+        _append_budget_rows(ws, new_rows, new_keys)
 
-    ws.append_row([month, category.strip(), str(limit)])
-    return False
+    return results
+
+
+def _append_budget_rows(ws, rows, keys):
+    # Appends budget rows and records their row numbers in the index.
+    if not _budget_index["has_header"]:
+        rows = [["month", "category", "limit"]] + rows
+        keys = [None] + keys
+
+    response = ratelimit.write(ws.append_rows, rows)
+    _budget_index["has_header"] = True
+
+    row_numbers = appended_row_numbers(response, len(rows))
+    for key, row_number in zip(keys, row_numbers):
+        if key is not None:
+            _budget_index["rows"][key] = row_number
 
 
 def append_budget(budget):
@@ -70,11 +527,16 @@ def append_budget(budget):
     Appends one budget row to the 'budgets' worksheet.
     Expected columns: month, category, limit
     """
-    sheet = open_sheet()
-    worksheet = sheet.worksheet("budgets")
-
-    worksheet.append_row([
+    row = [
         budget["month"],
         budget["category"],
         budget["limit"],
-    ])
+    ]
+    key = budget_key(budget["month"], budget["category"])
+
+    def append():
+        ws = get_worksheet("budgets")
+        get_budget_index()
+        _append_budget_rows(ws, [row], [key])
+
+    with_reconnect(append)
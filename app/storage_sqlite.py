@@ -0,0 +1,193 @@
+import os
+import sqlite3
+
+from app.ledger import build_index
+from app.models import Budget, Transaction, month_key, month_str, to_cents
+
+DB_FILE_PATH = os.path.join("data", "budget.db")
+
+# Ids are reserved one at a time; each reservation is a local write.
+ID_BLOCK_SIZE = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    month INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_date
+    ON transactions (date);
+CREATE INDEX IF NOT EXISTS idx_transactions_month_category
+    ON transactions (month, category);
+CREATE INDEX IF NOT EXISTS idx_transactions_type
+    ON transactions (type);
+
+CREATE TABLE IF NOT EXISTS sequence (
+    name TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS budgets (
+    month INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    category_norm TEXT NOT NULL,
+    limit_cents INTEGER NOT NULL,
+    PRIMARY KEY (month, category_norm)
+);
+"""
+
+INSERT_TRANSACTION = (
+    "INSERT INTO transactions"
+    " (id, day, date, month, type, category, amount_cents, note)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_connection = None
+
+
+def get_connection():
+    # Returns the session's database connection, creating the schema.
+    global _connection
+    if _connection is None:
+        directory = os.path.dirname(DB_FILE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # run.py loads on a background thread and the data service
+        # answers on handler threads; calls never overlap, so the
+        # connection may be shared between threads.
+        _connection = sqlite3.connect(
+            DB_FILE_PATH, check_same_thread=False)
+        _connection.executescript(SCHEMA)
+    return _connection
+
+
+def load_data():
+    """
+    Loads transactions and budgets from the SQLite database.
+    The per-month totals are computed by SQLite with GROUP BY
+    instead of summing every row in Python.
+    Returns a dict with keys: transactions, budgets
+    """
+    db = get_connection()
+
+    transactions = [
+        Transaction(t_id, date, t_type, category, amount_cents, note)
+        for t_id, date, t_type, category, amount_cents, note in db.execute(
+            "SELECT id, date, type, category, amount_cents, note"
+            " FROM transactions ORDER BY id")
+    ]
+    budgets = [
+        Budget(month_str(month), category, limit_cents)
+        for month, category, limit_cents in db.execute(
+            "SELECT month, category, limit_cents FROM budgets"
+            " ORDER BY rowid")
+    ]
+
+    return build_index(
+        {"transactions": transactions, "budgets": budgets},
+        totals=load_totals(),
+    )
+
+
+def load_years(years):
+    # Every year is loaded by load_data.
+    return []
+
+
+def load_totals():
+    """
+    Returns {month: {(type, category): total cents}} computed by
+    a SQL aggregate over the (month, category) index.
+    """
+    totals = {}
+    for month, t_type, category, total in get_connection().execute(
+            "SELECT month, type, category, SUM(amount_cents)"
+            " FROM transactions GROUP BY month, type, category"):
+        totals.setdefault(month, {})[(t_type, category)] = total
+    return totals
+
+
+def transaction_values(transaction):
+    return (
+        transaction.id,
+        transaction.day,
+        transaction.date,
+        transaction.month,
+        transaction.type,
+        transaction.category,
+        transaction.amount_cents,
+        transaction.note,
+    )
+
+
+def append_transaction(transaction):
+    # Inserts one Transaction.
+    db = get_connection()
+    with db:
+        db.execute(INSERT_TRANSACTION, transaction_values(transaction))
+
+
+def append_transactions(transactions):
+    # Inserts many Transactions in one database transaction.
+    db = get_connection()
+    with db:
+        db.executemany(
+            INSERT_TRANSACTION, map(transaction_values, transactions))
+
+
+def reserve_ids(count, floor):
+    """
+    Reserves count ids above floor and above every stored id.
+    BEGIN IMMEDIATE takes the write lock before the counter is read,
+    so other sessions using the same database wait their turn.
+    Returns the range of reserved ids.
+    """
+    db = get_connection()
+    with db:
+        db.execute("BEGIN IMMEDIATE")
+        row = db.execute(
+            "SELECT next_id FROM sequence WHERE name = 'transactions'"
+        ).fetchone()
+        (highest,) = db.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()
+        start = max(row[0] if row else 0, highest + 1, floor + 1)
+        db.execute(
+            "INSERT OR REPLACE INTO sequence (name, next_id)"
+            " VALUES ('transactions', ?)",
+            (start + count,),
+        )
+    return range(start, start + count)
+
+
+def upsert_budget(month: str, category: str, limit: float) -> bool:
+    """
+    Update budget if (month, category) exists, otherwise append.
+    Returns True if updated, False if appended.
+    """
+    db = get_connection()
+    key = (month_key(month.strip()), category.strip().lower())
+
+    with db:
+        updated = db.execute(
+            "UPDATE budgets SET category = ?, limit_cents = ?"
+            " WHERE month = ? AND category_norm = ?",
+            (category.strip(), to_cents(limit)) + key,
+        ).rowcount > 0
+        if not updated:
+            db.execute(
+                "INSERT INTO budgets"
+                " (month, category, category_norm, limit_cents)"
+                " VALUES (?, ?, ?, ?)",
+                (key[0], category.strip(), key[1], to_cents(limit)),
+            )
+    return updated
+
+
+def flush_transactions():
+    # Transactions are committed straight away, so nothing is pending.
+    return 0, 0.0
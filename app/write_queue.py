@@ -0,0 +1,252 @@
+import glob
+import json
+import os
+import threading
+import time
+
+from app import locks
+
+# Each session spools to its own file, named by its process id, and
+# holds the matching .lock file while it runs. A spool whose lock is
+# free was left by a session that has ended.
+SPOOL_DIR = "data"
+SPOOL_PREFIX = "pending_transactions"
+FLUSH_SIZE = 25
+FLUSH_INTERVAL_SECONDS = 5.0
+
+# Spool path -> open lock file, held until this process ends.
+_owned_spools = {}
+
+
+def session_spool_path():
+    # Returns the spool file of this process.
+    return os.path.join(SPOOL_DIR, f"{SPOOL_PREFIX}.{os.getpid()}.jsonl")
+
+
+def spool_lock_path(spool_path):
+    return os.path.splitext(spool_path)[0] + ".lock"
+
+
+def own_spool(spool_path):
+    """
+    Locks spool_path for this process until it ends.
+    Returns False if another process holds it.
+    """
+    if spool_path not in _owned_spools:
+        lock_file = locks.try_lock(spool_lock_path(spool_path))
+        if lock_file is None:
+            return False
+        _owned_spools[spool_path] = lock_file
+    return True
+
+
+def remove_spool_lock(spool_path, lock_file):
+    # Deletes the lock file of a spool that is gone, then releases it.
+    try:
+        os.remove(spool_lock_path(spool_path))
+    except FileNotFoundError:
+        pass
+    lock_file.close()
+
+
+def read_spool_file(path):
+    # Returns the transactions in a spool file.
+    if not os.path.exists(path):
+        return []
+
+    rows = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A half-written last line from a crash.
+                continue
+    return rows
+
+
+class WriteBehindQueue:
+    """
+    Collects transactions and writes them in batches.
+    Every queued transaction is first appended to a local spool file
+    owned by this session, so rows that were not flushed yet survive
+    a crash. The next session to start takes over the spools of
+    sessions that have ended. A batch is flushed when it reaches
+    max_rows, when interval seconds have passed, or on close().
+    """
+
+    def __init__(self, write_rows, spool_path=None,
+                 max_rows=FLUSH_SIZE, interval=FLUSH_INTERVAL_SECONDS):
+        self.write_rows = write_rows
+        self.spool_path = spool_path or session_spool_path()
+        self.max_rows = max_rows
+        self.interval = interval
+        if not own_spool(self.spool_path):
+            raise RuntimeError(
+                f"Spool {self.spool_path} is used by another process.")
+        self.pending = self._read_spool()
+        self.last_error = None
+        self.stats = {
+            "flushes": 0,
+            "rows": 0,
+            "last_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def _read_spool(self):
+        """
+        Returns the transactions in this session's spool plus those of
+        ended sessions, which are moved into this session's spool.
+        """
+        rows = read_spool_file(self.spool_path)
+        pattern = os.path.join(
+            os.path.dirname(self.spool_path), SPOOL_PREFIX + "*")
+        # Spools of other sessions, found by their spool or lock file
+        # (an ended session with nothing queued leaves only the lock).
+        paths = {
+            os.path.splitext(path)[0] + ".jsonl"
+            for path in glob.glob(pattern)
+            if path.endswith((".jsonl", ".lock"))
+        }
+        paths.discard(self.spool_path)
+        orphans = []
+        for path in sorted(paths):
+            # Held while the rows are moved, so no other starting
+            # session takes them too.
+            lock_file = locks.try_lock(spool_lock_path(path))
+            if lock_file is None:
+                continue
+            if os.path.exists(path):
+                orphans.append((path, lock_file))
+            else:
+                # Nothing was left queued, or another session has
+                # taken the spool over since the glob.
+                remove_spool_lock(path, lock_file)
+
+        if not orphans:
+            return rows
+
+        ids = {t["id"] for t in rows}
+        for path, _ in orphans:
+            for t in read_spool_file(path):
+                if t["id"] not in ids:
+                    ids.add(t["id"])
+                    rows.append(t)
+
+        # The rows are safe in this spool before the old ones go.
+        self._write_spool(rows)
+        for path, lock_file in orphans:
+            os.remove(path)
+            remove_spool_lock(path, lock_file)
+        return rows
+
+    def _write_spool(self, rows):
+        # Replaces the spool file with the given rows.
+        directory = os.path.dirname(self.spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if not rows:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return
+
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps(row) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def add(self, transaction):
+        """
+        Spools one transaction and schedules it to be written.
+        Flushes right away once the batch is full.
+        """
+        with self._lock:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(transaction) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+            self.pending.append(transaction)
+            full = len(self.pending) >= self.max_rows
+
+        if full:
+            self.flush()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        # Starts the flush timer if it is not already running.
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.interval, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # Kept in last_error; the rows stay queued for the next flush.
+            pass
+
+    def discard(self, ids):
+        """
+        Drops queued transactions whose id is already stored,
+        e.g. when a flush went through but the spool was not cleared.
+        """
+        with self._lock:
+            self.pending = [t for t in self.pending if t["id"] not in ids]
+            self._write_spool(self.pending)
+
+    def flush(self):
+        """
+        Writes all queued transactions in one call.
+        Returns the number of rows written. On failure the rows
+        stay queued and in the spool, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self.pending)
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self.write_rows(batch)
+            except Exception as error:
+                self.last_error = error
+                raise
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.pending = self.pending[len(batch):]
+                self._write_spool(self.pending)
+                self.last_error = None
+                self.stats["flushes"] += 1
+                self.stats["rows"] += len(batch)
+                self.stats["last_seconds"] = elapsed
+                self.stats["max_seconds"] = max(
+                    self.stats["max_seconds"], elapsed)
+
+            return len(batch)
+
+    def close(self):
+        # Stops the timer and writes whatever is still queued.
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return self.flush()
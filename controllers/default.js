@@ -21,7 +21,8 @@ function socket() {
             cols: 80,
             rows: 24,
             cwd: process.env.PWD,
-            env: process.env
+            // Sessions share one warm data service unless configured
+            env: Object.assign({ STORAGE_BACKEND: 'daemon' }, process.env)
         });
 
         client.tty.on('exit', function (code, signal) {
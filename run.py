@@ -1,13 +1,86 @@
+import argparse
 import csv
+import json
 import os
-from app.storage_sheets import load_data, append_transaction, upsert_budget
+import sys
+import threading
+from app import export, ids, importer, ledger, report_cache, search
+from app.ledger import month_index
+from app.models import (
+    MAX_YEAR, MIN_YEAR, Transaction, format_cents, month_key, month_str,
+    to_cents)
+from app.backend import get_backend
 from datetime import datetime
-from tabulate import tabulate
 
 
-MIN_YEAR = 2000
-MAX_YEAR = 3000
 MAX_BUDGET_LIMIT = 500000
+# Transactions shown per page when viewing all transactions.
+PAGE_SIZE = 20
+# Invalid rows listed after an import; the rest are only counted.
+MAX_SHOWN_IMPORT_ERRORS = 10
+MAX_SEARCH_RESULTS = 50
+
+# Storage module chosen by the STORAGE_BACKEND environment variable.
+# It is imported on first use, so the intro shows up before the
+# Google client libraries have loaded.
+storage = None
+
+
+def get_storage():
+    global storage
+    if storage is None:
+        storage = get_backend()
+    return storage
+
+
+def load_history(data, first=None, last=None):
+    """
+    Loads the older years the storage left out at startup that fall
+    between first and last (YYYY-MM months or YYYY-MM-DD dates;
+    a missing end means no limit on that side).
+    """
+    unloaded = data.get("unloaded_years")
+    if not unloaded:
+        return
+    first_year = int(first[:4]) if first else MIN_YEAR
+    last_year = int(last[:4]) if last else MAX_YEAR
+    years = [year for year in unloaded if first_year <= year <= last_year]
+    if years:
+        ledger.add_history(data, years, get_storage().load_years(years))
+
+
+def cached_report(data, report, month, compute):
+    """
+    Returns compute() for one report and YYYY-MM month, taken from the
+    report cache while nothing in that month has changed.
+    """
+    key = (report, month, ledger.month_version(data, month))
+    return report_cache.get_cache(data).get(key, compute)
+
+
+def month_summary(data, month):
+    # (income, expense) cents of a YYYY-MM month, shared by the reports.
+    return cached_report(
+        data, "summary", month, lambda: ledger.month_summary(data, month))
+
+
+def month_expenses(data, month):
+    # {category: expense cents} of a YYYY-MM month.
+    return cached_report(
+        data, "expenses", month,
+        lambda: ledger.category_totals(data, month, "expense"))
+
+
+def tabulate(rows, headers):
+    """
+    Formats rows as a grid table with amounts to two decimals, so
+    large totals are not shown in scientific notation.
+    tabulate is imported on first use.
+    """
+    from tabulate import tabulate as format_table
+
+    return format_table(
+        rows, headers=headers, tablefmt="grid", floatfmt=".2f")
 
 
 def pause():
@@ -25,8 +98,9 @@ def show_intro():
         "How to use:\n"
         "1) Transactions: add/view income and expenses\n"
         "2) Budgets: set a monthly limit per category\n"
-        "3) Reports: view monthly totals\n"
-        "4) Export: save transactions/reports to CSV\n\n"
+        "3) Reports: view monthly, quarterly, yearly and trend totals\n"
+        "4) Import / Export: load transactions from CSV, save\n"
+        "transactions/reports to CSV\n\n"
         "Tip: You will see menu options next. Use 0 in menus to go\n"
         "back or exit.\n"
     )
@@ -42,7 +116,7 @@ def display_main_menu():
         "1. Transactions\n"
         "2. Budgets\n"
         "3. Reports\n"
-        "4. Export\n"
+        "4. Import / Export\n"
         "0. Exit\n"
     )
     print(menu_text)
@@ -129,19 +203,6 @@ def add_transaction(data):
     note = input("Note (optional): ").strip()
     amount = prompt_for_amount()
 
-    next_id = 1
-    if data["transactions"]:
-        next_id = max(t["id"] for t in data["transactions"]) + 1
-
-    transaction = {
-        "id": next_id,
-        "date": date_str,
-        "type": t_type,
-        "category": category,
-        "amount": amount,
-        "note": note
-    }
-
     print("Please confirm your transaction:\n")
     print(f"Date: {date_str}")
     print(f"Type: {t_type}")
@@ -153,170 +214,383 @@ def add_transaction(data):
         print("Transaction cancelled. Nothing was saved.\n")
         return
 
-    append_transaction(transaction)
-    data["transactions"].append(transaction)
+    transaction = Transaction(
+        new_transaction_ids(data), date_str, t_type, category,
+        to_cents(amount), note)
+    get_storage().append_transaction(transaction)
+    ledger.add_transaction(data, transaction)
     print("\nTransaction saved.\n")
 
 
-def view_transactions(data):
-    # Displays all transactions in a readable format.
-    transactions = data["transactions"]
+def new_transaction_ids(data, count=1):
+    # Returns the first of count new ids from the session's allocator.
+    return ids.get_allocator(data, get_storage()).allocate(count)
 
-    if len(transactions) == 0:
-        print("No transactions yet.\n")
-        pause()
-        return
 
+def transaction_rows(transactions, income_total, expense_total):
+    """
+    Builds table rows for the given transactions,
+    followed by income, expense and net total rows.
+    The totals are passed in from the aggregates, so they cover
+    more than the rows shown when the view is paged.
+    """
     rows = []
-    income_total = 0
-    expense_total = 0
-
-    sorted_transactions = sorted(
-        transactions,
-        key=lambda t: t["date"],
-        reverse=True
-        )
-
-    for t in sorted_transactions:
-        amount = float(t["amount"])
-
-        if t["type"] == "income":
-            income_total += amount
-        elif t["type"] == "expense":
-            expense_total += amount
 
+    for t in transactions:
         rows.append([
-            t["id"],
-            t["date"],
-            t["type"],
-            t["category"],
-            f"{amount:.2f}",
-            t["note"] or ""
+            t.id,
+            t.date,
+            t.type,
+            t.category,
+            format_cents(t.amount_cents),
+            t.note
         ])
 
     net_total = income_total - expense_total
     rows.append(["", "", "", "", "", ""])
-    rows.append(["", "", "", "TOTAL INCOME", f"{income_total:.2f}", ""])
-    rows.append(["", "", "", "TOTAL EXPENSE", f"{expense_total:.2f}", ""])
-    rows.append(["", "", "", "NET", f"{net_total:.2f}", ""])
+    rows.append(["", "", "", "TOTAL INCOME", format_cents(income_total), ""])
+    rows.append(
+        ["", "", "", "TOTAL EXPENSE", format_cents(expense_total), ""])
+    rows.append(["", "", "", "NET", format_cents(net_total), ""])
+    return rows
+
 
-    print("All Transactions\n")
+def view_transactions(data):
+    """
+    Displays all transactions newest first, one page at a time.
+    Only the rows of the current page are rendered; the totals
+    below them are for all transactions.
+    """
+    load_history(data)
+    count = len(data["transactions"])
+
+    if count == 0:
+        print("No transactions yet.\n")
+        pause()
+        return
+
+    income_total, expense_total = ledger.overall_summary(data)
+    pages = (count + PAGE_SIZE - 1) // PAGE_SIZE
     headers = ["ID", "Date", "Type", "Category", "Amount", "Note"]
-    print(tabulate(rows, headers=headers, tablefmt="grid"))
-    pause()
+    page = 0
+
+    while page is not None:
+        transactions = ledger.transactions_page(data, page, PAGE_SIZE)
+        first = page * PAGE_SIZE + 1
+        last = first + len(transactions) - 1
+
+        print(f"\nAll Transactions, newest first (page {page + 1} of "
+              f"{pages}, rows {first}-{last} of {count})\n")
+        rows = transaction_rows(transactions, income_total, expense_total)
+        print(tabulate(rows, headers))
+        page = prompt_for_page(data, page, pages)
+
+
+def prompt_for_page(data, page, pages):
+    """
+    Asks which page of transactions to show next.
+    Returns the page number (from 0), or None to go back.
+    """
+    while True:
+        choice = input(
+            "n = next, p = previous, d = jump to date, "
+            "page number, 0 = back: ").strip().lower()
+
+        if choice in ("", "n"):
+            if page + 1 < pages:
+                return page + 1
+            print("This is the last page.")
+        elif choice == "p":
+            if page > 0:
+                return page - 1
+            print("This is the first page.")
+        elif choice == "d":
+            day = datetime.strptime(prompt_for_date(), "%Y-%m-%d")
+            return ledger.page_of_date(data, day.toordinal(), PAGE_SIZE)
+        elif choice == "0":
+            return None
+        elif choice.isdigit() and 1 <= int(choice) <= pages:
+            return int(choice) - 1
+        else:
+            print(f"Invalid choice. Enter n, p, d, 0 or a page from "
+                  f"1 to {pages}.")
 
 
 def view_transactions_by_month(data):
     month = prompt_for_month_or_date()
-    transactions = [
-        t for t in data["transactions"]
-        if t["date"].startswith(month)
-    ]
+    load_history(data, month, month)
+    transactions = ledger.transactions_for_month(data, month)
 
     if not transactions:
         print(f"\nNo transactions found for {month}.\n")
         pause()
         return
 
-    rows = []
-    income_total = 0.0
-    expense_total = 0.0
-
-    sorted_transactions = sorted(
-        transactions,
-        key=lambda t: t["date"],
-        reverse=True
-    )
+    income_total, expense_total = month_summary(data, month)
+    rows = transaction_rows(
+        reversed(transactions), income_total, expense_total)
 
-    for t in sorted_transactions:
-        amount = float(t["amount"])
-        if t["type"] == "income":
-            income_total += amount
-        elif t["type"] == "expense":
-            expense_total += amount
+    print(f"\nTransactions for {month}\n")
+    headers = ["ID", "Date", "Type", "Category", "Amount", "Note"]
+    print(tabulate(rows, headers))
+    pause()
 
-        rows.append([
-            t["id"],
-            t["date"],
-            t["type"],
-            t["category"],
-            f"{amount:.2f}",
-            t["note"] or ""
-        ])
 
-    net_total = income_total - expense_total
-    rows.append(["", "", "", "", "", ""])
-    rows.append(["", "", "", "TOTAL INCOME", f"{income_total:.2f}", ""])
-    rows.append(["", "", "", "TOTAL EXPENSE", f"{expense_total:.2f}", ""])
-    rows.append(["", "", "", "NET", f"{net_total:.2f}", ""])
+def search_transactions(data):
+    """
+    Finds transactions by words in their note or category, an amount
+    range and a date range, and shows the newest matches with the
+    totals of all of them. Blank answers leave a filter out.
+    """
+    print("\nSearch Transactions")
+    print("-" * 19)
+    words = search.tokenize(
+        input("Words in note or category (blank = any): "))
+    min_cents = prompt_for_optional_amount(
+        "Minimum amount (blank = no minimum): ")
+    max_cents = prompt_for_optional_amount(
+        "Maximum amount (blank = no maximum): ")
+    start = prompt_for_optional_date("From date (YYYY-MM-DD, blank = all): ")
+    end = prompt_for_optional_date("To date (YYYY-MM-DD, blank = all): ")
+
+    load_history(data, start, end)
+    first_day = date_ordinal(start) if start else None
+    last_day = date_ordinal(end) if end else None
+    matches = search.get_index(data).find(
+        words, min_cents, max_cents, first_day, last_day)
+
+    if not matches:
+        print("\nNo matching transactions found.\n")
+        pause()
+        return
 
-    print(f"\nTransactions for {month}\n")
+    income_total = sum(
+        t.amount_cents for t in matches if t.type == "income")
+    expense_total = sum(
+        t.amount_cents for t in matches if t.type == "expense")
+    shown = search.newest(matches, MAX_SEARCH_RESULTS)
+
+    print(f"\n{len(matches)} matching transaction(s), newest first")
+    if len(shown) < len(matches):
+        print(f"Showing the newest {len(shown)}; add filters to narrow "
+              "the search.")
+    print()
     headers = ["ID", "Date", "Type", "Category", "Amount", "Note"]
-    print(tabulate(rows, headers=headers, tablefmt="grid"))
+    print(tabulate(transaction_rows(shown, income_total, expense_total),
+                   headers))
     pause()
 
 
+def date_ordinal(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+
+
 def monthly_report(data):
     """
     Displays income, expenses, and balance for a given month
     as a table.
     """
     month = prompt_for_month_or_date()
+    print_monthly_report(data, month)
+    pause()
 
-    income_total = 0
-    expense_total = 0
-    matches = 0
-    expense_by_category = {}
-
-    for t in data["transactions"]:
-        if t["date"].startswith(month):
-            matches += 1
-            amount = float(t["amount"])
-
-            if t["type"] == "income":
-                income_total += amount
-            elif t["type"] == "expense":
-                expense_total += amount
-                cat = t["category"]
-                expense_by_category[cat] = (
-                    expense_by_category.get(cat, 0.0) + amount)
-
-    if matches == 0:
-        print(f"No transactions found for {month}.\n")
-        pause()
-        return
-
-    balance = income_total - expense_total
 
-    print(f"Monthly Report for {month}:\n")
+def monthly_report_rows(data, month):
+    """
+    Returns the summary row and the expense breakdown rows
+    (largest first) of the monthly report for a YYYY-MM month.
+    """
+    income_total, expense_total = month_summary(data, month)
+    expense_by_category = month_expenses(data, month)
 
-    summary_rows = [[
+    summary_row = [
         month,
-        f"{income_total:.2f}",
-        f"{expense_total:.2f}",
-        f"{balance:.2f}"
-    ]]
+        format_cents(income_total),
+        format_cents(expense_total),
+        format_cents(income_total - expense_total)
+    ]
+
+    breakdown_rows = []
+    for cat, total in sorted(
+            expense_by_category.items(),
+            key=lambda item: item[1],
+            reverse=True):
+        breakdown_rows.append([cat, format_cents(total)])
+
+    return summary_row, breakdown_rows
+
+
+def print_monthly_report(data, month):
+    # Prints the monthly report tables for a YYYY-MM month.
+    load_history(data, month, month)
+    print(cached_report(
+        data, "monthly_report", month,
+        lambda: monthly_report_text(data, month)))
+
+
+def monthly_report_text(data, month):
+    # Returns the monthly report tables for a YYYY-MM month as text.
+    if not ledger.transactions_for_month(data, month):
+        return f"No transactions found for {month}.\n"
+
+    summary_row, breakdown_rows = monthly_report_rows(data, month)
+
     summary_headers = ["Month", "Total Income", "Total Expenses", "Balance"]
-    print(tabulate(summary_rows, headers=summary_headers, tablefmt="grid"))
+    lines = [
+        f"Monthly Report for {month}:\n",
+        tabulate([summary_row], summary_headers),
+    ]
+    if not breakdown_rows:
+        lines.append("No expenses to break down for this month.\n")
+    else:
+        lines.append("Expenses by Category\n")
+        lines.append(tabulate(breakdown_rows, ["Category", "Total"]))
+    return "\n".join(lines)
 
-    if not expense_by_category:
-        print("No expenses to break down for this month.\n")
-        pause()
-        return
+
+def range_report(data, message):
+    """
+    Displays income, expenses and balance over a range of months,
+    with expenses by category.
+    """
+    first, last = prompt_for_period(message)
+    print_range_report(data, first, last)
+    pause()
+
+
+def trend_report(data):
+    # Displays month-over-month totals for a range of months.
+    first, last = prompt_for_period(
+        "Enter months (YYYY-MM..YYYY-MM, YYYY-Qn or YYYY): ")
+    print_trend_report(data, first, last)
+    pause()
+
+
+def period_label(first, last):
+    return first if first == last else f"{first}..{last}"
+
+
+def range_report_rows(data, first, last):
+    """
+    Returns the summary row and the expense breakdown rows
+    (largest first, with their share) for months first..last.
+    Totals come from the prefix sums, so the range length does not
+    matter.
+    """
+    income_total, expense_total = ledger.range_summary(data, first, last)
+    expense_by_category = ledger.range_category_totals(
+        data, first, last, "expense")
+    month_count = (
+        month_index(month_key(last)) - month_index(month_key(first)) + 1)
+
+    summary_row = [
+        period_label(first, last),
+        month_count,
+        format_cents(income_total),
+        format_cents(expense_total),
+        format_cents(income_total - expense_total),
+        format_cents(expense_total // month_count),
+    ]
 
     breakdown_rows = []
-    for cat, total in expense_by_category.items():
-        breakdown_rows.append([cat, f"{total:.2f}"])
+    for cat, total in sorted(
+            expense_by_category.items(),
+            key=lambda item: item[1],
+            reverse=True):
+        share = total / expense_total * 100
+        breakdown_rows.append([cat, format_cents(total), f"{share:.1f}%"])
+
+    return summary_row, breakdown_rows
+
+
+def print_range_report(data, first, last):
+    # Prints the range report tables for months first..last.
+    load_history(data, first, last)
+    label = period_label(first, last)
+    if ledger.range_summary(data, first, last) == (0, 0):
+        print(f"No transactions found for {label}.\n")
+        return
+
+    summary_row, breakdown_rows = range_report_rows(data, first, last)
 
-    breakdown_rows.sort(key=lambda r: float(r[1]), reverse=True)
+    print(f"Report for {label}:\n")
+    summary_headers = [
+        "Period", "Months", "Total Income", "Total Expenses", "Balance",
+        "Avg Monthly Expenses"]
+    print(tabulate([summary_row], summary_headers))
+
+    if not breakdown_rows:
+        print("No expenses to break down for this period.\n")
+        return
 
     print("Expenses by Category\n")
-    print(tabulate(
-        breakdown_rows,
-        headers=["Category", "Total"],
-        tablefmt="grid"
-    ))
-    pause()
+    print(tabulate(breakdown_rows, ["Category", "Total", "Share"]))
+
+
+def trend_rows(data, first, last):
+    """
+    Returns one row per month from first to last: income, expenses,
+    balance and the change in expenses from the month before.
+    """
+    rows = []
+    previous = None
+    for month in months_between(first, last):
+        income_total, expense_total = ledger.range_summary(
+            data, month, month)
+        change = ""
+        if previous:
+            change = f"{(expense_total - previous) / previous * 100:+.1f}%"
+        rows.append([
+            month,
+            format_cents(income_total),
+            format_cents(expense_total),
+            format_cents(income_total - expense_total),
+            change,
+        ])
+        previous = expense_total
+    return rows
+
+
+def print_trend_report(data, first, last):
+    # Prints the month-over-month table for months first..last.
+    load_history(data, first, last)
+    print(f"Month-over-month for {period_label(first, last)}:\n")
+    headers = ["Month", "Income", "Expenses", "Balance", "Expense Change"]
+    print(tabulate(trend_rows(data, first, last), headers))
+
+
+def reports_flow(data):
+    # Handles the reports submenu loop.
+    while True:
+        display_reports_menu()
+        choice = get_user_choice()
+
+        if choice == "1":
+            monthly_report(data)
+        elif choice == "2":
+            range_report(data, "Enter quarter (YYYY-Qn, e.g. 2026-Q1): ")
+        elif choice == "3":
+            range_report(data, "Enter year (YYYY): ")
+        elif choice == "4":
+            range_report(data, "Enter months (YYYY-MM..YYYY-MM): ")
+        elif choice == "5":
+            trend_report(data)
+        elif choice == "0":
+            break
+        else:
+            print("\nInvalid choice. Please enter a number from the menu.")
+
+
+def display_reports_menu():
+    # Displays the reports submenu options.
+    print("\nReports")
+    print("-" * 7)
+    print("1. Monthly report")
+    print("2. Quarterly report")
+    print("3. Yearly report")
+    print("4. Report for a range of months")
+    print("5. Month-over-month trend")
+    print("0. Back to main menu")
 
 
 def transactions_flow(data):
@@ -331,6 +605,8 @@ def transactions_flow(data):
             view_transactions(data)
         elif choice == "3":
             view_transactions_by_month(data)
+        elif choice == "4":
+            search_transactions(data)
         elif choice == "0":
             break
         else:
@@ -360,23 +636,9 @@ def set_budget(data):
         pause()
         return
 
-    updated = upsert_budget(month, category, limit)
+    updated = get_storage().upsert_budget(month, category, limit)
 
-    found = False
-    for b in data["budgets"]:
-        if (b["month"] == month and
-                b["category"].lower() == category.strip().lower()):
-            b["category"] = category
-            b["limit"] = limit
-            found = True
-            break
-
-    if not found:
-        data["budgets"].append({
-            "month": month,
-            "category": category,
-            "limit": limit
-        })
+    ledger.set_budget(data, month, category, to_cents(limit))
 
     if updated:
         print(f"\nUpdated budget for {category} in {month} to {limit:.2f}\n")
@@ -392,46 +654,57 @@ def view_budget_status(data):
     And calculate it by the month.
     """
     month = prompt_for_month_or_date()
+    print_budget_status(data, month)
+    pause()
 
-    # Sum up the expenses by category for the month
-    spending_by_category = {}
-    for t in data["transactions"]:
-        if t["date"].startswith(month) and t["type"] == "expense":
-            cat = t["category"]
-            spending_by_category[cat] = (
-                spending_by_category.get(cat, 0) + float(t["amount"])
-            )
-
-    budgets_for_month = [b for b in data["budgets"] if b["month"] == month]
-
-    print(f"\nBudget Status for {month}")
-    print("-" * 22)
 
-    if len(budgets_for_month) == 0:
-        print("No budgets set for this month.\n")
-        pause()
-        return
+def budget_status_rows(data, month):
+    """
+    Returns one row per budget of a YYYY-MM month:
+    category, limit, spent, remaining and OK/OVER, sorted by category.
+    """
+    # Expenses by category for the month, from the running totals
+    spending_by_category = month_expenses(data, month)
 
     rows = []
-    for b in budgets_for_month:
-        cat = b["category"]
-        limit = b["limit"]
+    for b in ledger.budgets_for_month(data, month):
+        cat = b.category
+        limit = b.limit_cents
         spent = spending_by_category.get(cat, 0)
         remaining = limit - spent
         status = "OK" if remaining >= 0 else "OVER"
 
         rows.append([
             cat,
-            f"{limit:.2f}",
-            f"{spent:.2f}",
-            f"{remaining:.2f}",
+            format_cents(limit),
+            format_cents(spent),
+            format_cents(remaining),
             status
         ])
 
-    headers = ["Category", "Limit", "Spent", "Remaining", "Status"]
     rows.sort(key=lambda r: r[0])
-    print(tabulate(rows, headers=headers, tablefmt="grid"))
-    pause()
+    return rows
+
+
+def print_budget_status(data, month):
+    # Prints the budget status table for a YYYY-MM month.
+    load_history(data, month, month)
+    print(cached_report(
+        data, "budget_status", month,
+        lambda: budget_status_text(data, month)))
+
+
+def budget_status_text(data, month):
+    # Returns the budget status table for a YYYY-MM month as text.
+    rows = budget_status_rows(data, month)
+
+    lines = [f"\nBudget Status for {month}", "-" * 22]
+    if not rows:
+        lines.append("No budgets set for this month.\n")
+    else:
+        headers = ["Category", "Limit", "Spent", "Remaining", "Status"]
+        lines.append(tabulate(rows, headers))
+    return "\n".join(lines)
 
 
 def budgets_flow(data):
@@ -466,15 +739,61 @@ def prompt_for_month_or_date():
     """
     while True:
         s = input("Enter month (YYYY-MM) or date (YYYY-MM-DD): ").strip()
-        if len(s) == 7 and s[4] == "-":
-            return s
         try:
-            dt = datetime.strptime(s, "%Y-%m-%d")
-            return dt.strftime("%Y-%m")
+            return parse_month_or_date(s)
         except ValueError:
             print("Invalid format. Use YYYY-MM or YYYY-MM-DD.")
 
 
+def prompt_for_period(message):
+    """
+    Prompts for a period (see parse_period) until it is valid.
+    Returns (first, last) YYYY-MM months.
+    """
+    while True:
+        try:
+            return parse_period(input(message))
+        except ValueError:
+            print("Invalid period. Use YYYY, YYYY-Qn, YYYY-MM or "
+                  "YYYY-MM..YYYY-MM.")
+
+
+def parse_period(s):
+    """
+    Returns (first, last) YYYY-MM months for a period written as
+    YYYY, YYYY-Qn, YYYY-MM, YYYY-MM-DD or YYYY-MM..YYYY-MM.
+    Raises ValueError for anything else.
+    """
+    s = s.strip().upper()
+    if ".." in s:
+        first, last = (parse_month_or_date(part) for part in s.split(".."))
+    elif "-Q" in s:
+        year, quarter = s.split("-Q")
+        if not (len(year) == 4 and year.isdigit() and quarter in "1234"
+                and len(quarter) == 1):
+            raise ValueError(f"Invalid quarter: {s!r}")
+        first = f"{year}-{int(quarter) * 3 - 2:02d}"
+        last = f"{year}-{int(quarter) * 3:02d}"
+    elif len(s) == 4 and s.isdigit():
+        first, last = f"{s}-01", f"{s}-12"
+    else:
+        first = last = parse_month_or_date(s)
+
+    if first > last:
+        raise ValueError(f"{first} is after {last}.")
+    if int(first[:4]) < MIN_YEAR or int(last[:4]) > MAX_YEAR:
+        raise ValueError(f"Years must be between {MIN_YEAR} and {MAX_YEAR}.")
+    return first, last
+
+
+def parse_month_or_date(s):
+    # Returns YYYY-MM for a YYYY-MM or YYYY-MM-DD string.
+    s = s.strip()
+    if len(s) == 7:
+        return datetime.strptime(s, "%Y-%m").strftime("%Y-%m")
+    return datetime.strptime(s, "%Y-%m-%d").strftime("%Y-%m")
+
+
 def prompt_for_category():
     """
     Prompts user for a category name.
@@ -511,10 +830,12 @@ def prompt_for_limit():
 
 def display_export_menu():
     # Displays export submenu options.
-    print("\nExport")
-    print("-" * 6)
+    print("\nImport / Export")
+    print("-" * 15)
     print("1. Export all transactions (CSV)")
     print("2. Export monthly summary report (CSV)")
+    print("3. Import transactions (CSV)")
+    print("4. Export selected transactions (CSV, gzip, Parquet)")
     print("0. Back to main menu")
 
 
@@ -528,6 +849,10 @@ def export_flow(data):
             export_transactions_csv(data)
         elif choice == "2":
             export_monthly_report_csv(data)
+        elif choice == "3":
+            import_transactions_csv(data)
+        elif choice == "4":
+            export_selected_transactions(data)
         elif choice == "0":
             break
         else:
@@ -537,18 +862,19 @@ def export_flow(data):
 def export_monthly_report_csv(data):
     # Exports a monthly income/expense/balance report to a CSV file.
     month = prompt_for_month_or_date()
+    file_path = write_monthly_report_csv(data, month)
+    print(f"Exported monthly report to {file_path}\n")
 
-    income_total = 0
-    expense_total = 0
+    pause()
 
-    for t in data["transactions"]:
-        if t["date"].startswith(month):
-            amount = float(t["amount"])
 
-            if t["type"] == "income":
-                income_total += amount
-            elif t["type"] == "expense":
-                expense_total += amount
+def write_monthly_report_csv(data, month):
+    """
+    Writes exports/monthly_report_YYYY-MM.csv for a YYYY-MM month.
+    Returns the file path.
+    """
+    load_history(data, month, month)
+    income_total, expense_total = month_summary(data, month)
 
     balance = income_total - expense_total
 
@@ -558,11 +884,14 @@ def export_monthly_report_csv(data):
     with open(file_path, "w", newline="", encoding="utf-8") as file:
         writer = csv.writer(file)
         writer.writerow(["month", "total_income", "total_expenses", "balance"])
-        writer.writerow([month, income_total, expense_total, balance])
-
-    print(f"Exported monthly report to {file_path}\n")
+        writer.writerow([
+            month,
+            income_total / 100,
+            expense_total / 100,
+            balance / 100
+        ])
 
-    pause()
+    return file_path
 
 
 def export_transactions_csv(data):
@@ -570,28 +899,139 @@ def export_transactions_csv(data):
     Exports all transactions to
     a CSV file in the exports folder.
     """
-    os.makedirs("exports", exist_ok=True)
-    file_path = os.path.join("exports", "transactions.csv")
+    load_history(data)
+    file_path, _ = export.export_transactions(data)
+    print(f"Exported transactions to {file_path}\n")
 
-    with open(file_path, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["id", "date", "type", "category", "amount", "note"])
-
-        for t in data["transactions"]:
-            writer.writerow([
-                t["id"],
-                t["date"],
-                t["type"],
-                t["category"],
-                t["amount"],
-                t["note"]
-            ])
+    pause()
+
+
+def export_selected_transactions(data):
+    """
+    Exports transactions filtered by date range and category, as
+    CSV, gzip CSV or Parquet, optionally only those added since the
+    last export to the same file.
+    """
+    formats = ", ".join(export.FORMATS)
+    while True:
+        fmt = input(f"Format ({formats}) [csv]: ").strip().lower() or "csv"
+        if fmt in export.FORMATS:
+            break
+        print(f"Invalid format. Please enter one of: {formats}.")
+
+    start = prompt_for_optional_date("From date (YYYY-MM-DD, blank = all): ")
+    end = prompt_for_optional_date("To date (YYYY-MM-DD, blank = all): ")
+    categories = input(
+        "Categories, comma separated (blank = all): ").strip()
+    categories = [c for c in categories.split(",") if c.strip()]
+    incremental = fmt != "parquet" and confirm_action(
+        "Only add transactions not exported before? (y/n): ")
+
+    load_history(data, start, end)
+    try:
+        file_path, count = export.export_transactions(
+            data, fmt, start=start, end=end, categories=categories,
+            incremental=incremental)
+    except (OSError, ValueError) as error:
+        print(f"Could not export: {error}\n")
+        pause()
+        return
+
+    print(f"Exported {count} transaction(s) to {file_path}\n")
+    pause()
+
+
+def prompt_for_optional_date(message):
+    """
+    Prompts for a YYYY-MM-DD date that may be left blank.
+    Returns the date string or None.
+    """
+    while True:
+        date_str = input(message).strip()
+        if not date_str:
+            return None
+        try:
+            datetime.strptime(date_str, "%Y-%m-%d")
+            return date_str
+        except ValueError:
+            print("Invalid date format. Please use YYYY-MM-DD.")
 
-    print(f"Exported transactions to {file_path}\n")
 
+def prompt_for_optional_amount(message):
+    """
+    Prompts for an amount that may be left blank.
+    Returns the amount in cents or None.
+    """
+    while True:
+        amount_str = input(message).strip().replace(",", ".")
+        if not amount_str:
+            return None
+        try:
+            cents = to_cents(amount_str)
+        except ValueError:
+            print("Invalid amount. Please enter a number (e.g. 12.50).")
+            continue
+        if cents < 0:
+            print("Amount cannot be negative.")
+            continue
+        return cents
+
+
+def import_transactions_csv(data):
+    """
+    Imports transactions from a CSV file: an export of this app or
+    a bank statement. Shows what will be added and asks before saving.
+    """
+    print("\nImport Transactions")
+    print("-" * 19)
+
+    path = input("CSV file path: ").strip()
+    layouts = ", ".join(importer.LAYOUTS)
+    layout_name = input(
+        f"Layout ({layouts} or a JSON layout file) [planner]: ").strip()
+
+    try:
+        layout = importer.get_layout(layout_name or "planner")
+        # Rows are checked for duplicates against every year.
+        load_history(data)
+        result = importer.prepare_import(data, path, layout)
+    except (OSError, ValueError) as error:
+        print(f"Could not read the file: {error}\n")
+        pause()
+        return
+
+    print_import_summary(result)
+    count = len(result["transactions"])
+    if not count:
+        print("Nothing to import.\n")
+        pause()
+        return
+
+    if not confirm_action(f"Import {count} transaction(s)? (y/n): "):
+        print("Import cancelled. Nothing was saved.\n")
+        pause()
+        return
+
+    seconds = importer.save_import(data, get_storage(), result["transactions"])
+    print(f"\nImported {count} transaction(s) in {seconds:.2f}s.\n")
     pause()
 
 
+def print_import_summary(result):
+    # Prints the counts of a prepared import and its first invalid rows.
+    print(f"\nRows read: {result['rows']}")
+    print(f"New transactions: {len(result['transactions'])}")
+    print(f"Duplicates skipped: {result['duplicates']}")
+    print(f"Invalid rows skipped: {len(result['errors'])}")
+
+    for line, message in result["errors"][:MAX_SHOWN_IMPORT_ERRORS]:
+        print(f"  Line {line}: {message}")
+    hidden = len(result["errors"]) - MAX_SHOWN_IMPORT_ERRORS
+    if hidden > 0:
+        print(f"  ... and {hidden} more.")
+    print()
+
+
 def display_transactions_menu():
     #  Displays the transactions submenu options.
     print("\nTransactions")
@@ -599,13 +1039,334 @@ def display_transactions_menu():
     print("1. Add transaction")
     print("2. View all transactions")
     print("3. View transactions by month")
+    print("4. Search transactions")
     print("0. Back to main menu")
 
 
+def save_pending_transactions():
+    """
+    Writes transactions still waiting in the write-behind queue.
+    Returns False if they could not be saved yet.
+    """
+    try:
+        written, seconds = get_storage().flush_transactions()
+    except Exception as error:
+        print(f"Could not save pending transactions: {error}")
+        print("They are kept locally and will be saved next time.\n")
+        return False
+
+    if written:
+        print(f"Saved {written} pending transaction(s) in {seconds:.2f}s.")
+    return True
+
+
+def date_arg(value):
+    # argparse type for date options: YYYY-MM-DD.
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date {value!r}, use YYYY-MM-DD") from None
+
+
+def period_arg(value):
+    # argparse type for --period.
+    try:
+        return parse_period(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid period {value!r}, use YYYY, YYYY-Qn, YYYY-MM or "
+            "YYYY-MM..YYYY-MM") from None
+
+
+def month_arg(value):
+    # argparse type for month options: YYYY-MM or YYYY-MM-DD.
+    try:
+        return parse_month_or_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid month {value!r}, use YYYY-MM or YYYY-MM-DD"
+        ) from None
+
+
+def months_between(first, last):
+    # Yields every YYYY-MM month from first to last, inclusive.
+    key, last_key = month_key(first), month_key(last)
+    while key <= last_key:
+        yield month_str(key)
+        key += 1 if key % 100 < 12 else 89
+
+
+def transaction_from_values(values, t_id):
+    """
+    Builds a transaction from a dict with date, type, category,
+    amount and an optional note, checked like the add prompts.
+    Raises ValueError if a value is missing or invalid.
+    """
+    if not isinstance(values, dict):
+        raise ValueError("Each transaction must be a JSON object.")
+
+    date_str = str(values.get("date", "")).strip()
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.") from None
+    if date_obj.year < MIN_YEAR or date_obj.year > MAX_YEAR:
+        raise ValueError(f"Year must be between {MIN_YEAR} and {MAX_YEAR}.")
+
+    t_type = str(values.get("type", "")).strip().lower()
+    if t_type not in ("income", "expense"):
+        raise ValueError("Invalid type. Use 'income' or 'expense'.")
+
+    category = str(values.get("category", "")).strip()
+    if not category:
+        raise ValueError("Category cannot be empty.")
+
+    amount_cents = to_cents(values.get("amount"))
+    if amount_cents <= 0:
+        raise ValueError("Amount must be greater than 0.")
+
+    note = str(values.get("note") or "").strip()
+    return Transaction(
+        t_id, date_str, t_type, category.title(), amount_cents, note)
+
+
+def add_from_json(data, values):
+    """
+    Saves one transaction (a JSON object) or several (a list).
+    Nothing is saved unless every transaction is valid.
+    Returns the exit status.
+    """
+    records = values if isinstance(values, list) else [values]
+
+    transactions = []
+    for number, record in enumerate(records):
+        try:
+            transactions.append(transaction_from_values(record, 0))
+        except ValueError as error:
+            print(f"Transaction {number + 1}: {error}", file=sys.stderr)
+            return 1
+
+    # Ids are reserved only once every record is valid.
+    first_id = new_transaction_ids(data, len(transactions))
+    for number, t in enumerate(transactions):
+        t.id = first_id + number
+
+    for t in transactions:
+        get_storage().append_transaction(t)
+        ledger.add_transaction(data, t)
+        print(f"Added transaction {t.id}: {t.date} {t.type} "
+              f"{t.category} {format_cents(t.amount_cents)}")
+
+    return 0 if save_pending_transactions() else 1
+
+
+def export_monthly_reports(data, first, last):
+    """
+    Writes one monthly report CSV for every month from first to
+    last. Missing ends default to the earliest and latest months
+    with transactions. Returns the exit status.
+    """
+    load_history(data, first, last)
+    if data["by_month"]:
+        first = first or month_str(min(data["by_month"]))
+        last = last or month_str(max(data["by_month"]))
+    if not first or not last:
+        print("No transactions to export.", file=sys.stderr)
+        return 1
+    if month_key(first) > month_key(last):
+        print(f"--from {first} is after --to {last}.", file=sys.stderr)
+        return 1
+
+    for month in months_between(first, last):
+        file_path = write_monthly_report_csv(data, month)
+        print(f"Exported monthly report to {file_path}")
+    return 0
+
+
+def import_from_csv(data, path, layout_name, dry_run):
+    """
+    Imports a CSV file from the command line. Valid rows are saved
+    even if others are invalid. Returns the exit status: 1 if the
+    file could not be read or any row was invalid.
+    """
+    try:
+        layout = importer.get_layout(layout_name)
+        load_history(data)
+        result = importer.prepare_import(data, path, layout)
+    except (OSError, ValueError) as error:
+        print(f"Could not read the file: {error}", file=sys.stderr)
+        return 1
+
+    print_import_summary(result)
+    if not dry_run:
+        count = len(result["transactions"])
+        seconds = importer.save_import(
+            data, get_storage(), result["transactions"])
+        print(f"Imported {count} transaction(s) in {seconds:.2f}s.")
+        if not save_pending_transactions():
+            return 1
+    return 1 if result["errors"] else 0
+
+
+def export_transactions_file(data, args):
+    # Runs "export transactions" with its options; returns the status.
+    load_history(data, args.start, args.end)
+    try:
+        file_path, count = export.export_transactions(
+            data, args.format, args.output, args.start, args.end,
+            args.categories, args.incremental)
+    except (OSError, ValueError) as error:
+        print(f"Could not export: {error}", file=sys.stderr)
+        return 1
+    print(f"Exported {count} transaction(s) to {file_path}")
+    return 0
+
+
+def build_parser():
+    # Command-line options for running one command without prompts.
+    parser = argparse.ArgumentParser(
+        prog="run.py",
+        description="Personal Budget Planner. Run without a command "
+                    "for the interactive menus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser(
+        "report", help="print the report for a month or a period")
+    periods = report.add_mutually_exclusive_group(required=True)
+    periods.add_argument("--month", type=month_arg)
+    periods.add_argument(
+        "--period", type=period_arg,
+        help="YYYY, YYYY-Qn, YYYY-MM or YYYY-MM..YYYY-MM")
+    report.add_argument(
+        "--trend", action="store_true",
+        help="print month-over-month totals instead")
+
+    status = commands.add_parser(
+        "budget-status", help="print the budget status of a month")
+    status.add_argument("--month", type=month_arg, required=True)
+
+    export_files = commands.add_parser(
+        "export", help="write files to the exports folder")
+    targets = export_files.add_subparsers(dest="target", required=True)
+    transactions = targets.add_parser(
+        "transactions", help="write exports/transactions.<format>")
+    transactions.add_argument(
+        "--format", choices=list(export.FORMATS), default="csv")
+    transactions.add_argument(
+        "--output", help="file to write (default: "
+                         "exports/transactions.<format>)")
+    transactions.add_argument(
+        "--from-date", dest="start", type=date_arg,
+        help="first date to include (YYYY-MM-DD)")
+    transactions.add_argument(
+        "--to-date", dest="end", type=date_arg,
+        help="last date to include (YYYY-MM-DD)")
+    transactions.add_argument(
+        "--category", dest="categories", action="append",
+        help="only this category; can be given more than once")
+    transactions.add_argument(
+        "--incremental", action="store_true",
+        help="only append transactions added since the last export "
+             "to the same file")
+    monthly = targets.add_parser(
+        "monthly", help="write exports/monthly_report_YYYY-MM.csv "
+                        "for each month in a range")
+    monthly.add_argument(
+        "--from", dest="first", type=month_arg,
+        help="first month (default: earliest with transactions)")
+    monthly.add_argument(
+        "--to", dest="last", type=month_arg,
+        help="last month (default: latest with transactions)")
+
+    import_csv = commands.add_parser(
+        "import", help="import transactions from a CSV file")
+    import_csv.add_argument("file", help="CSV file to import")
+    import_csv.add_argument(
+        "--layout", default="planner",
+        help="column layout: " + ", ".join(importer.LAYOUTS)
+             + " or a JSON layout file (default: planner)")
+    import_csv.add_argument(
+        "--dry-run", action="store_true",
+        help="check the file and print the summary without saving")
+
+    add = commands.add_parser("add", help="add transactions")
+    add.add_argument(
+        "--json", required=True,
+        help="a JSON object with date, type, category, amount and "
+             "note, or a list of them; - reads it from standard input")
+    return parser
+
+
+def run_command(argv):
+    """
+    Runs one command-line command, e.g. "report --month 2026-01",
+    with the data loaded once. Returns the exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        text = sys.stdin.read() if args.json == "-" else args.json
+        try:
+            values = json.loads(text)
+        except ValueError as error:
+            parser.error(f"invalid JSON: {error}")
+
+    data = get_storage().load_data()
+
+    if args.command == "report":
+        first, last = args.period or (args.month, args.month)
+        if args.trend:
+            print_trend_report(data, first, last)
+        elif args.month:
+            print_monthly_report(data, args.month)
+        else:
+            print_range_report(data, first, last)
+    elif args.command == "budget-status":
+        print_budget_status(data, args.month)
+    elif args.command == "export" and args.target == "transactions":
+        return export_transactions_file(data, args)
+    elif args.command == "export":
+        return export_monthly_reports(data, args.first, args.last)
+    elif args.command == "import":
+        return import_from_csv(data, args.file, args.layout, args.dry_run)
+    elif args.command == "add":
+        return add_from_json(data, values)
+    return 0
+
+
+def start_loading():
+    """
+    Starts loading the data in a background thread, so it arrives
+    while the user reads the intro.
+    Returns a function that waits for the data and returns it.
+    """
+    result = {}
+
+    def load():
+        try:
+            result["data"] = get_storage().load_data()
+        except Exception as error:
+            result["error"] = error
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+
+    def wait():
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["data"]
+
+    return wait
+
+
 def main():
     # Main application loop.
+    wait_for_data = start_loading()
     show_intro()
-    data = load_data()
+    data = wait_for_data()
 
     while True:
         print(f"\nLoaded {len(data['transactions'])} transactions.")
@@ -617,10 +1378,11 @@ def main():
         elif choice == "2":
             budgets_flow(data)
         elif choice == "3":
-            monthly_report(data)
+            reports_flow(data)
         elif choice == "4":
             export_flow(data)
         elif choice == "0":
+            save_pending_transactions()
             print("Thank you for using Personal Budget Planner. Goodbye!\n")
             break
         else:
@@ -628,4 +1390,6 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     main()